@@ -1,14 +1,19 @@
 
 """
 The analytics module provides various analytics functions that return data about the users habits.
+Every function accepts a database connection or a storage object (see the storage module).
 """
 
+import heapq
+from storage import as_storage
+from trends import trend_stats
+
 def get_all_habits(db):
     """
     Retrieve all tracked habits with all their data.
     Returns a list of dictionaries, where each dictionary represents a habit.
 
-    :param db: The database connection object.
+    :param db: The database connection or storage object.
     :return: A list of dictionaries, where each dictionary represents a habit with the following keys:
              - "name": The name of the habit.
              - "description": A brief description of the habit.
@@ -17,77 +22,95 @@ def get_all_habits(db):
              - "current_streak": The current streak value of the habit.
              - "last_increment_date": The timestamp of the last increment or None if not set.
     """
-    cur = db.cursor()
-    cur.execute("SELECT name, description, periodicity, created_at, current_streak, last_increment_date FROM habits")
-    results = cur.fetchall()
-    return [
-        {
-            "name": row[0],
-            "description": row[1],
-            "periodicity": row[2],
-            "created_at": row[3],
-            "current_streak": row[4],
-            "last_increment_date": row[5]
-        }
-        for row in results
-    ]
+    return as_storage(db).scan()
+
+
+def get_habits_page(db, after=None, limit=50, periodicity=None):
+    """
+    Retrieve one page of tracked habits ordered by name, e.g. to display many habits without loading all of them.
+
+    :param db: The database connection or storage object.
+    :param after: The name of the last habit of the previous page, None for the first page.
+    :param limit: The maximum number of habits per page.
+    :param periodicity: Optional periodicity to filter habits by (e.g., "daily", "weekly").
+    :return: A list of dictionaries with the same keys as get_all_habits().
+    """
+    return as_storage(db).scan_page(after, limit, periodicity)
 
 
 def get_habits_by_periodicity(db, periodicity):
     """
     Retrieve the names of habits filtered by their periodicity from the database.
 
-    :param db: The database connection object.
+    :param db: The database connection or storage object.
     :param periodicity: The periodicity to filter habits by (e.g., "daily", "weekly").
     :return: A list of strings, where each string is the name of a habit with the specified periodicity.
     """
-    cur = db.cursor()
-    cur.execute("SELECT name FROM habits WHERE LOWER(periodicity) = ?", (periodicity.lower(),))
-    results = cur.fetchall()
-    return [row[0] for row in results]
+    return as_storage(db).habits_by_periodicity(periodicity)
 
 def calculate_longest_streak(db, habit_name):
     """
-    Calculates the longest streak for a given habit by querying the increments table to find
-    the maximum streak value.
+    Calculates the longest streak for a given habit by finding the maximum streak value of its increments.
 
-    :param db: The database connection object.
+    :param db: The database connection or storage object.
     :param habit_name: The name of the habit for which the longest streak is calculated.
     :return: An integer representing the longest streak for the specified habit.
             Returns 0 if no streak records exist.
     """
-    cur = db.cursor()
-    cur.execute("SELECT MAX(streak) FROM increments WHERE habitName = ?", (habit_name,))
-    result = cur.fetchone()
-    return result[0] if result else 0
+    return as_storage(db).longest_streak(habit_name)
 
 
 
 def calculate_longest_streak_all(db):
     """
-    Finds the habit(s) with the longest streak across all habits by querying the increments table.
+    Finds the habit(s) with the longest streak across all habits.
 
-    :param db: The database connection object.
+    :param db: The database connection or storage object.
     :return: A list of dictionaries, each containing:
              - "habit": The name of the habit.
              - "longest_streak": The highest streak value recorded for that habit.
              Returns an empty list if no streak data exists in the database.
     """
-    cur = db.cursor()
-    try: #using WHERE and returning a list of habits allows to handle the case where there is not only one habit with the highest habit streak
-        cur.execute("""
-            SELECT habitName, streak
-            FROM increments
-            WHERE streak = (SELECT MAX(streak) FROM increments) 
-        """)
-        results = cur.fetchall()
+    try:
+        results = as_storage(db).longest_streak_all()
 
         if not results:
             return []  # Return an empty list if no results
 
-        # Access rows as tuples using positional indices
-        return [{"habit": row[0], "longest_streak": row[1]} for row in results]
+        return results
 
     except Exception as e:
         print(f"Database error while fetching the longest streak across all habits: {e}")
         return []
+
+
+def get_habit_trends(db, habit_name, now=None):
+    """
+    Returns the rolling statistics of a habit, see trends.trend_stats().
+    The statistics are maintained on every increment, so the increments are not read again.
+
+    :param db: The database connection or storage object.
+    :param habit_name: The name of the habit.
+    :param now: The reference datetime, defaults to the current time.
+    :return: A dictionary with the 7/30/90-day completion rates, the consistency score, the breaks and the break frequency.
+    :raises ValueError: If the habit with the specified name does not exist.
+    """
+    state = as_storage(db).trend_state(habit_name)
+    return trend_stats(state["trend"], state["periodicity"], state["created_at"], now)
+
+
+def get_most_struggling_habits(db, limit=5, now=None):
+    """
+    Ranks the habits the user is struggling with the most.
+    Habits with the lowest consistency score come first; habits with the same score are ordered by their break frequency.
+
+    :param db: The database connection or storage object.
+    :param limit: The maximum number of habits to be returned.
+    :param now: The reference datetime, defaults to the current time.
+    :return: A list of dictionaries with the key "habit" and the statistics of trends.trend_stats().
+    """
+    ranked = (
+        {"habit": state["name"], **trend_stats(state["trend"], state["periodicity"], state["created_at"], now)}
+        for state in as_storage(db).trend_states()
+    )
+    return heapq.nsmallest(limit, ranked, key=lambda habit: (habit["consistency"], -habit["break_frequency"]))
@@ -0,0 +1,202 @@
+"""
+The archive module deletes or archives many habits at once without blocking other writers for long.
+
+Deleting is split into two steps:
+1. soft_delete_habits() moves the selected habits from the habits table into deleted_habits in one short transaction.
+   From then on the habits are gone for the rest of the application and their names can be reused.
+2. purge_deleted_habits() removes (or moves to an archive database) the increments of soft-deleted habits in small
+   batches, each in its own transaction, and returns the freed pages to the file system with incremental_vacuum.
+   PurgeWorker runs this step on a background thread with its own connection.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from db import get_db, notify, flush, _forget_habit_id
+
+BATCH_SIZE = 1000
+VACUUM_PAGES = 100 #number of free pages returned to the file system after each batch
+CHUNK_SIZE = 500 #number of names per IN (...) clause, stays below SQLite's variable limit
+
+logger = logging.getLogger(__name__)
+
+HABIT_COLUMNS = "habit_id, name, description, periodicity, created_at, current_streak, last_increment_date"
+
+
+def soft_delete_habits(db, names=None, inactive_since=None):
+    """
+    Soft-deletes habits selected by name and/or by inactivity.
+    The habits are moved to the deleted_habits table in a single transaction; their increments stay in place until
+    purge_deleted_habits() removes them.
+
+    :param db: The database connection object.
+    :param names: An iterable of habit names to delete. Unknown names are ignored.
+    :param inactive_since: A datetime or timestamp string. Habits that were not incremented (or, if never incremented,
+                           not created) since then are deleted as well.
+    :return: A list with the names of the soft-deleted habits.
+    :raises ValueError: If neither names nor inactive_since is given.
+    """
+    if names is None and inactive_since is None:
+        raise ValueError("Either names or inactive_since must be given.")
+
+    flush(db) #commits writes waiting for a group commit, the rollback below must only discard this transaction
+    cur = db.cursor()
+    habit_ids = {}
+    if names is not None:
+        names = list(names)
+        for start in range(0, len(names), CHUNK_SIZE):
+            chunk = names[start:start + CHUNK_SIZE]
+            cur.execute(f"SELECT habit_id, name FROM habits WHERE name IN ({', '.join('?' * len(chunk))})", chunk)
+            habit_ids.update(cur.fetchall())
+    if inactive_since is not None:
+        if isinstance(inactive_since, datetime):
+            inactive_since = inactive_since.strftime("%Y-%m-%d %H:%M:%S")
+        cur.execute("SELECT habit_id, name FROM habits WHERE COALESCE(last_increment_date, created_at) < ?", (inactive_since,))
+        habit_ids.update(cur.fetchall())
+
+    deleted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    ids = list(habit_ids)
+    try:
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start:start + CHUNK_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            cur.execute(f"""INSERT OR REPLACE INTO deleted_habits ({HABIT_COLUMNS}, deleted_at)
+                SELECT {HABIT_COLUMNS}, ? FROM habits WHERE habit_id IN ({placeholders})""", [deleted_at, *chunk])
+            cur.execute(f"DELETE FROM habits WHERE habit_id IN ({placeholders})", chunk)
+        flush(db)
+    except Exception:
+        db.rollback()
+        raise
+
+    for name in habit_ids.values():
+        _forget_habit_id(db, name)
+        notify("delete", db, name)
+    return list(habit_ids.values())
+
+
+def _attach_archive(db, archive_path):
+    db.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+    db.execute("""CREATE TABLE IF NOT EXISTS archive.habits (
+        habit_id INTEGER PRIMARY KEY,
+        name TEXT,
+        description TEXT,
+        periodicity TEXT,
+        created_at TEXT,
+        current_streak INT,
+        last_increment_date TEXT,
+        deleted_at TEXT)""")
+    db.execute("""CREATE TABLE IF NOT EXISTS archive.increments (
+        incremented_at TEXT,
+        habit_id INTEGER,
+        streak INTEGER)""")
+    flush(db)
+
+
+def purge_deleted_habits(db, archive_path=None, batch_size=BATCH_SIZE, pause=0.0, stop_event=None):
+    """
+    Removes the increments of soft-deleted habits in batches and finally drops the habits' tombstones.
+    Every batch is committed separately, so other writers wait at most for one batch.
+    Freed pages are only returned to the file system if the database uses incremental vacuum; databases created by
+    get_db() and migrated legacy databases do, others have to be converted with enable_incremental_vacuum() once.
+
+    :param db: The database connection object.
+    :param archive_path: Optional path of an archive database. If given, the habits and their increments are copied
+                         there before they are removed.
+    :param batch_size: The maximum number of increments removed per transaction.
+    :param pause: Seconds to sleep between batches to give other writers room.
+    :param stop_event: Optional threading.Event that stops the purge after the current batch.
+    :return: The number of increments that were removed.
+    """
+    flush(db) #commits writes waiting for a group commit, the rollback below must only discard an unfinished batch
+    if archive_path:
+        _attach_archive(db, archive_path)
+
+    purged = 0
+    cur = db.cursor()
+    try:
+        while not (stop_event and stop_event.is_set()):
+            cur.execute("SELECT habit_id FROM deleted_habits LIMIT 1")
+            tombstone = cur.fetchone()
+            if not tombstone:
+                break
+            habit_id = tombstone[0]
+
+            cur.execute("SELECT rowid FROM increments WHERE habit_id = ? LIMIT ?", (habit_id, batch_size))
+            rowids = cur.fetchall()
+            if rowids:
+                if archive_path:
+                    cur.executemany("""INSERT INTO archive.increments (incremented_at, habit_id, streak)
+                        SELECT incremented_at, habit_id, streak FROM increments WHERE rowid = ?""", rowids)
+                cur.executemany("DELETE FROM increments WHERE rowid = ?", rowids)
+                purged += len(rowids)
+            else: #all increments are gone, the tombstone can be removed
+                if archive_path:
+                    cur.execute(f"""INSERT OR REPLACE INTO archive.habits ({HABIT_COLUMNS}, deleted_at)
+                        SELECT {HABIT_COLUMNS}, deleted_at FROM deleted_habits WHERE habit_id = ?""", (habit_id,))
+                cur.execute("DELETE FROM deleted_habits WHERE habit_id = ?", (habit_id,))
+            flush(db)
+            db.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+
+            if pause:
+                time.sleep(pause)
+        db.execute("PRAGMA incremental_vacuum").fetchall()
+    finally:
+        db.rollback()
+        if archive_path:
+            db.execute("DETACH DATABASE archive")
+    return purged
+
+
+def enable_incremental_vacuum(db):
+    """
+    Switches a database that was created without auto_vacuum to incremental vacuum mode.
+    This requires a full VACUUM once and should be run while the database is not in use.
+
+    :param db: The database connection object.
+    :return: None
+    """
+    if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        db.execute("VACUUM")
+
+
+class PurgeWorker(threading.Thread):
+    def __init__(self, name="main.db", archive_path=None, batch_size=BATCH_SIZE, interval=1.0, pause=0.05):
+        """
+        Background thread that periodically purges soft-deleted habits.
+        The worker opens its own connection, so it needs a database file; in-memory databases cannot be shared.
+
+        :param name: The name of the database file.
+        :param archive_path: Optional path of an archive database, see purge_deleted_habits().
+        :param batch_size: The maximum number of increments removed per transaction.
+        :param interval: Seconds to wait before looking for new soft-deleted habits.
+        :param pause: Seconds to sleep between batches.
+        """
+        super().__init__(daemon=True)
+        self.db_name = name
+        self.archive_path = archive_path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pause = pause
+        self.purged = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        db = get_db(self.db_name)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    self.purged += purge_deleted_habits(db, self.archive_path, self.batch_size, self.pause, self._stop_event)
+                except Exception: #e.g. "database is locked" while another connection writes, the next run continues
+                    logger.exception("Purging soft-deleted habits failed, retrying in %s seconds.", self.interval)
+                self._stop_event.wait(self.interval)
+        finally:
+            db.close()
+
+    def stop(self):
+        """
+        Stops the worker after the current batch and waits for it to finish.
+        """
+        self._stop_event.set()
+        self.join()
@@ -0,0 +1,118 @@
+"""
+The background module runs database work off the thread that drives the command-line interface.
+
+SQLite connections can only be used by the thread that created them, so BackgroundDB owns a single worker thread
+with its own connection. HabitPager uses it to fetch the next page of habits while the current one is shown.
+"""
+
+import itertools
+import sys
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from analytics import get_habits_page
+from db import get_db
+
+
+class BackgroundDB:
+    def __init__(self, name="main.db"):
+        """
+        Worker thread with its own database connection.
+
+        :param name: The name of the database file.
+        """
+        self.name = name
+        self._db = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="habit-db")
+
+    def _connection(self):
+        if self._db is None: #created on first use, inside the worker thread
+            self._db = get_db(self.name)
+        return self._db
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Schedules function(db, *args, **kwargs) on the worker thread.
+
+        :return: A concurrent.futures.Future with the result of the function.
+        """
+        return self._executor.submit(lambda: function(self._connection(), *args, **kwargs))
+
+    def run(self, function, *args, **kwargs):
+        """
+        Runs function(db, *args, **kwargs) on the worker thread and waits for the result.
+        """
+        return self.submit(function, *args, **kwargs).result()
+
+    def close(self):
+        """
+        Closes the connection and stops the worker thread after the scheduled work is done.
+        """
+        def close_connection():
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+        self._executor.submit(close_connection)
+        self._executor.shutdown(wait=True)
+
+
+def wait_for(future, message, stream=sys.stdout, interval=0.1):
+    """
+    Waits for a future and shows a spinner next to the message while it is not done.
+    Nothing is shown for work that finishes within the first interval.
+
+    :param future: The concurrent.futures.Future to wait for.
+    :param message: The text shown next to the spinner.
+    :param stream: The stream the spinner is written to.
+    :param interval: Seconds between two frames of the spinner.
+    :return: The result of the future.
+    """
+    frames = itertools.cycle("|/-\\")
+    shown = False
+    try:
+        while True:
+            try:
+                return future.result(timeout=interval)
+            except TimeoutError:
+                stream.write(f"\r{message} {next(frames)}")
+                stream.flush()
+                shown = True
+    finally:
+        if shown:
+            stream.write("\r" + " " * (len(message) + 2) + "\r")
+            stream.flush()
+
+
+class HabitPager:
+    def __init__(self, background, page_size=20, periodicity=None):
+        """
+        Iterates over all habits page by page. The next page is fetched on the worker thread while the caller
+        shows the current one.
+
+        :param background: The BackgroundDB used to fetch the pages.
+        :param page_size: The number of habits per page.
+        :param periodicity: Optional periodicity to filter habits by (e.g., "daily", "weekly").
+        """
+        self.background = background
+        self.page_size = page_size
+        self.periodicity = periodicity
+        self._next = background.submit(get_habits_page, None, page_size, periodicity)
+
+    def next_page(self, message="Loading habits"):
+        """
+        Returns the next page of habits and starts fetching the one after it.
+
+        :param message: The text shown next to the spinner if the page is not fetched yet.
+        :return: A list of habit dictionaries, empty after the last page.
+        """
+        if self._next is None:
+            return []
+        page = wait_for(self._next, message)
+        if len(page) < self.page_size:
+            self._next = None
+        else:
+            self._next = self.background.submit(get_habits_page, page[-1]["name"], self.page_size, self.periodicity)
+        return page
+
+    @property
+    def has_more(self):
+        return self._next is not None
@@ -0,0 +1,35 @@
+"""
+Measures the increment throughput of the durability levels on a database file.
+
+Run from the repository root:
+    python benchmarks/bench_durability.py [increments]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from db import get_db, add_habit, increment_habit, set_durability
+
+
+def run(increments):
+    print(f"{increments} increments")
+    for level in ("strict", "group", "buffered"):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = get_db(os.path.join(tmp, "habits.db"))
+            set_durability(db, level, journal_path=os.path.join(tmp, "habits.journal"))
+            add_habit(db, "Yoga", "", "Daily", "2024-01-01 09:00:00")
+
+            start = time.perf_counter()
+            for streak in range(1, increments + 1):
+                increment_habit(db, "Yoga", "2024-01-01 09:00:00", streak)
+            db.close()
+            elapsed = time.perf_counter() - start
+            print(f"  {level:<10} {increments / elapsed:10.0f} increments/s")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
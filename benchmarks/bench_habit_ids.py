@@ -0,0 +1,87 @@
+"""
+Compares the database size and query times of the old name keyed schema with the integer habit_id schema.
+
+Run from the repository root:
+    python benchmarks/bench_habit_ids.py [habits] [increments per habit]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import sqlite3
+from db import get_db
+from analytics import calculate_longest_streak
+
+LEGACY_SCHEMA = [
+    """CREATE TABLE habits (name TEXT PRIMARY KEY, description TEXT, periodicity TEXT, created_at TEXT,
+        current_streak INT, last_increment_date TEXT)""",
+    """CREATE TABLE increments (incremented_at TEXT, habitName TEXT, streak INTEGER,
+        FOREIGN KEY (habitName) REFERENCES habit(name))""",
+]
+
+
+def habit_name(i):
+    return f"Habit number {i} with a realistic, somewhat longer name"
+
+
+def fill(db, habits, increments, legacy):
+    for i in range(habits):
+        db.execute("INSERT INTO habits (name, description, periodicity, created_at, current_streak) VALUES (?, ?, ?, ?, ?)",
+                   (habit_name(i), "Description", "Daily", "2024-01-01 09:00:00", 0))
+    if legacy:
+        rows = (("2024-01-01 09:00:00", habit_name(i), n) for i in range(habits) for n in range(increments))
+        db.executemany("INSERT INTO increments (incremented_at, habitName, streak) VALUES (?, ?, ?)", rows)
+    else:
+        ids = dict(db.execute("SELECT name, habit_id FROM habits"))
+        rows = (("2024-01-01 09:00:00", ids[habit_name(i)], n) for i in range(habits) for n in range(increments))
+        db.executemany("INSERT INTO increments (incremented_at, habit_id, streak) VALUES (?, ?, ?)", rows)
+    db.commit()
+
+
+def timed(label, function, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        function(i)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed / repeat * 1e6:10.1f} us/op")
+
+
+def run(habits, increments):
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        legacy = sqlite3.connect(legacy_path)
+        for statement in LEGACY_SCHEMA:
+            legacy.execute(statement)
+        fill(legacy, habits, increments, legacy=True)
+
+        new_path = os.path.join(tmp, "habit_id.db")
+        new = get_db(new_path)
+        fill(new, habits, increments, legacy=False)
+
+        print(f"{habits} habits, {increments} increments each")
+        for label, path in (("name keyed", legacy_path), ("habit_id keyed", new_path)):
+            print(f"  {label + ' size':<28} {os.path.getsize(path) / 1024:10.0f} KiB")
+
+        repeat = min(habits, 200)
+        print("name keyed")
+        timed("longest streak", lambda i: legacy.execute(
+            "SELECT MAX(streak) FROM increments WHERE habitName = ?", (habit_name(i),)).fetchone(), repeat)
+        timed("delete habit", lambda i: (legacy.execute("DELETE FROM increments WHERE habitName = ?", (habit_name(i),)),
+                                         legacy.execute("DELETE FROM habits WHERE name = ?", (habit_name(i),)),
+                                         legacy.commit()), repeat)
+
+        print("habit_id keyed")
+        timed("longest streak", lambda i: calculate_longest_streak(new, habit_name(i)), repeat)
+        timed("delete habit", lambda i: (new.execute("DELETE FROM increments WHERE habit_id = ?", (i + 1,)),
+                                         new.execute("DELETE FROM habits WHERE habit_id = ?", (i + 1,)),
+                                         new.commit()), repeat)
+        legacy.close()
+        new.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 100)
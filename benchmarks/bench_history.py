@@ -0,0 +1,88 @@
+"""
+Compares the size and query latency of the history bitset with the row-per-increment layout of the increments table.
+
+Run from the repository root:
+    python benchmarks/bench_history.py [habits] [days]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from db import get_db, add_habit
+from history import get_history_stats, mark_completed, period_index
+
+
+def fill(db, habits, days):
+    rng = random.Random(1)
+    created_at = datetime(2024, 1, 1, 9)
+    for i in range(habits):
+        name = f"Habit {i}"
+        add_habit(db, name, "", "Daily", created_at.strftime("%Y-%m-%d %H:%M:%S"))
+        habit_id = db.habit_ids[name]
+        rows, history, streak = [], b"", 0
+        for day in range(days):
+            if rng.random() < 0.8:
+                streak += 1
+                timestamp = (created_at + timedelta(days=day)).strftime("%Y-%m-%d %H:%M:%S")
+                rows.append((timestamp, habit_id, streak))
+                history = mark_completed(history, period_index("Daily", created_at, timestamp))
+            else:
+                streak = 0
+        db.executemany("INSERT INTO increments (incremented_at, habit_id, streak) VALUES (?, ?, ?)", rows)
+        db.execute("UPDATE habits SET history = ? WHERE habit_id = ?", (history, habit_id))
+    db.commit()
+
+
+def row_stats(db, name, now):
+    #the same statistics as get_history_stats(), calculated from the increments table
+    cur = db.execute("""SELECT DISTINCT date(incremented_at) FROM increments
+        WHERE habit_id = (SELECT habit_id FROM habits WHERE name = ?) ORDER BY 1""", (name,))
+    dates = [datetime.strptime(row[0], "%Y-%m-%d").date() for row in cur]
+    longest = run = 0
+    previous = None
+    for date in dates:
+        run = run + 1 if previous and date - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = date
+    current = run if previous and (now.date() - previous).days <= 1 else 0
+    return {"completed_periods": len(dates), "longest_streak": longest, "current_streak": current}
+
+
+def table_size(db, *names):
+    try:
+        placeholders = ", ".join("?" * len(names))
+        return db.execute(f"SELECT SUM(pgsize) FROM dbstat WHERE name IN ({placeholders})", names).fetchone()[0]
+    except Exception: #SQLite was built without the dbstat table
+        return None
+
+
+def run(habits, days):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = get_db(os.path.join(tmp, "history.db"))
+        fill(db, habits, days)
+        now = datetime(2024, 1, 1) + timedelta(days=days)
+
+        print(f"{habits} daily habits, {days} days, 80% completed")
+        rows_size = table_size(db, "increments", "idx_increments_habit_id")
+        if rows_size:
+            print(f"  increments table + index    {rows_size / 1024:10.0f} KiB")
+        history_size = db.execute("SELECT SUM(LENGTH(history)) FROM habits").fetchone()[0]
+        print(f"  history bitsets             {history_size / 1024:10.1f} KiB")
+
+        repeat = min(habits, 200)
+        for label, function in (("row scan", row_stats), ("bitset", get_history_stats)):
+            start = time.perf_counter()
+            for i in range(repeat):
+                function(db, f"Habit {i}", now)
+            print(f"  {label + ' stats':<27} {(time.perf_counter() - start) / repeat * 1e6:10.1f} us/habit")
+        db.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, int(sys.argv[2]) if len(sys.argv) > 2 else 365)
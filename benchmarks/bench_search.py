@@ -0,0 +1,44 @@
+"""
+Measures search_habits() latency on a database with many habits.
+
+Run from the repository root:
+    python benchmarks/bench_search.py [habits]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from db import get_db, search_habits
+
+WORDS = ["morning", "evening", "read", "write", "run", "walk", "water", "plants", "call", "parents", "review",
+         "finances", "meditate", "stretch", "journal", "practice", "guitar", "spanish", "cook", "clean"]
+
+
+def run(habits):
+    db = get_db(":memory:")
+    rng = random.Random(1)
+    rows = [
+        (f"{' '.join(rng.sample(WORDS, 3))} {i}", " ".join(rng.sample(WORDS, 6)), "Daily", "2024-01-01 09:00:00", 0)
+        for i in range(habits)
+    ]
+    start = time.perf_counter()
+    db.executemany("INSERT INTO habits (name, description, periodicity, created_at, current_streak) VALUES (?, ?, ?, ?, ?)", rows)
+    db.commit()
+    print(f"{habits} habits indexed in {time.perf_counter() - start:.2f} s")
+
+    for query in ["m", "me", "medit", "meditate gui", "guitra", "spanish cook 123"]:
+        repeat = 20
+        start = time.perf_counter()
+        for _ in range(repeat):
+            results = search_habits(db, query)
+        elapsed = (time.perf_counter() - start) / repeat
+        print(f"  {query!r:<20} {elapsed * 1e3:8.2f} ms  {len(results)} results")
+    db.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
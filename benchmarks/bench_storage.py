@@ -0,0 +1,76 @@
+"""
+Runs the same workload against the storage backends and prints the time per operation.
+
+Run from the repository root:
+    python benchmarks/bench_storage.py [habits] [increments per habit]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analytics import get_all_habits, get_habits_by_periodicity, calculate_longest_streak, calculate_longest_streak_all
+from db import get_db
+from storage import MemoryStorage, SQLiteStorage
+
+
+def workload(storage, habits, increments):
+    timings = {}
+
+    start = time.perf_counter()
+    for i in range(habits):
+        storage.add_habit(f"Habit {i}", "Description", "Daily" if i % 2 else "Weekly", "2024-01-01 09:00:00")
+    timings["add"] = (time.perf_counter() - start) / habits
+
+    start = time.perf_counter()
+    for n in range(1, increments + 1):
+        for i in range(habits):
+            storage.increment_habit(f"Habit {i}", "2024-01-01 09:00:00", n)
+    timings["increment"] = (time.perf_counter() - start) / (habits * increments)
+
+    start = time.perf_counter()
+    for i in range(habits):
+        calculate_longest_streak(storage, f"Habit {i}")
+    timings["longest streak"] = (time.perf_counter() - start) / habits
+
+    start = time.perf_counter()
+    for _ in range(10):
+        get_all_habits(storage)
+        get_habits_by_periodicity(storage, "daily")
+        calculate_longest_streak_all(storage)
+    timings["scan + aggregates"] = (time.perf_counter() - start) / 10
+    return timings
+
+
+def run(habits, increments):
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+
+        db = get_db(os.path.join(tmp, "file.db"))
+        results["sqlite file"] = workload(SQLiteStorage(db), habits, increments)
+        db.close()
+
+        db = get_db(":memory:")
+        results["sqlite :memory:"] = workload(SQLiteStorage(db), habits, increments)
+        db.close()
+
+        results["memory"] = workload(MemoryStorage(), habits, increments)
+
+        storage = MemoryStorage(persist_to=os.path.join(tmp, "write_behind.db"), interval=0.5)
+        results["memory write-behind"] = workload(storage, habits, increments)
+        start = time.perf_counter()
+        storage.close()
+        print(f"write-behind: final flush took {time.perf_counter() - start:.2f} s")
+
+    print(f"{habits} habits, {increments} increments each (us/op)")
+    operations = list(next(iter(results.values())))
+    print(f"  {'backend':<22}" + "".join(f"{operation:>20}" for operation in operations))
+    for backend, timings in results.items():
+        print(f"  {backend:<22}" + "".join(f"{timings[operation] * 1e6:20.1f}" for operation in operations))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, int(sys.argv[2]) if len(sys.argv) > 2 else 10)
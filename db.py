@@ -2,7 +2,87 @@
 The database module groups all database interactions. The provided functions can then be used by other modules.
 """
 
+import functools
+import logging
+import re
 import sqlite3
+import threading
+from durability import Durability, BUFFERED, GROUP
+from history import period_index, mark_completed
+from trends import update_trend, to_row, from_row
+
+TREND_COLUMNS = ["trend_first_period", "trend_last_period", "trend_recent", "trend_consistency", "trend_breaks"]
+
+logger = logging.getLogger(__name__)
+
+
+class HabitDB(sqlite3.Connection):
+    """
+    SQLite connection used by the habit tracker.
+    Next to the regular connection it holds a cache that maps habit names to their integer habit_id,
+    so the name based API does not have to look the id up on every call, and its durability settings.
+    The writes of the db module hold its lock, so the timer of a group commit can commit from another thread.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.habit_ids = {}
+        self.durability = None
+        self.lock = threading.RLock()
+
+    def close(self):
+        with self.lock:
+            if self.durability is not None:
+                flush(self) #commits writes that are still waiting for a group commit
+                self.durability.close()
+                self.durability = None
+            super().close()
+
+
+def _serialized(function):
+    #runs a write of the db module while holding the lock of the connection, see HabitDB
+    @functools.wraps(function)
+    def wrapper(db, *args, **kwargs):
+        lock = getattr(db, "lock", None)
+        if lock is None:
+            return function(db, *args, **kwargs)
+        with lock:
+            return function(db, *args, **kwargs)
+    return wrapper
+
+
+#callbacks registered through add_listener(), called after the change was written
+listeners = {"increment": [], "delete": []}
+
+
+def add_listener(event, callback):
+    """
+    Registers a callback that is called after a habit was changed.
+
+    "increment": callback(db, name, event_timestamp, streak) after increment_habit()
+    "delete": callback(db, name) after a habit was deleted
+
+    :param event: The name of the event, either "increment" or "delete".
+    :param callback: The function to be called.
+    :return: None
+    """
+    listeners[event].append(callback)
+
+
+def remove_listener(event, callback):
+    """
+    Removes a callback registered with add_listener().
+
+    :param event: The name of the event, either "increment" or "delete".
+    :param callback: The function to be removed.
+    :return: None
+    """
+    listeners[event].remove(callback)
+
+
+def notify(event, *args):
+    for callback in list(listeners[event]):
+        callback(*args)
+
 
 def get_db(name="main.db"):
     """
@@ -11,39 +91,320 @@ def get_db(name="main.db"):
     :param name: The name of the database file (default is "main.db").
     :return: A connection object to the SQLite database.
     """
-    db = sqlite3.connect(name)
+    db = sqlite3.connect(name, factory=HabitDB, check_same_thread=False) #the group commit timer commits from its own thread
+    if db.execute("PRAGMA page_count").fetchone()[0] == 0: #auto_vacuum can only be set for new databases, see archive.enable_incremental_vacuum()
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
     create_tables(db)
     return db
 
 def create_tables(db):
     """
     Creates the required tables if they do not exist already. Otherwise does nothing.
+    Databases created before the habit_id column existed are migrated by migrate_habit_ids() and switched to
+    incremental vacuum, see archive.enable_incremental_vacuum().
 
     habits: Stores details about habits, including name, description, periodicity, creation date,
-    current streak, and the last increment date.
+    current streak, the last increment date, the integer habit_id used as primary key, the
+    completion history as bitset and the rolling statistics of the trends module.
 
-    increments: Stores records of habit increments, including the timestamp, habit name,
+    increments: Stores records of habit increments, including the timestamp, habit_id
     and streak value at the time of the increment.
 
+    deleted_habits: Stores habits that were soft-deleted by the archive module until their increments are purged.
+
+    habits_fts: Full-text index over the name and description of all habits, see create_search_index().
+
     :param db: The database connection object.
     :return: None
     """
     cur = db.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'habits'")
+    if cur.fetchone() and "habit_id" not in _columns(db, "habits"):
+        migrate_habit_ids(db)
+        #the tables were rebuilt anyway, so the one-time VACUUM that enables incremental vacuum is cheap here
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        db.execute("VACUUM")
+
     cur.execute("""CREATE TABLE IF NOT EXISTS habits ( 
-        name TEXT PRIMARY KEY, 
+        name TEXT UNIQUE, 
         description TEXT,
         periodicity TEXT,
         created_at TEXT,
         current_streak INT,
-        last_increment_date TEXT)""")
+        last_increment_date TEXT,
+        habit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        history BLOB,
+        trend_first_period INTEGER,
+        trend_last_period INTEGER,
+        trend_recent BLOB,
+        trend_consistency REAL,
+        trend_breaks INTEGER)""") #AUTOINCREMENT makes sure the id of a deleted habit is never reused
+    if "history" not in _columns(db, "habits"):
+        cur.execute("ALTER TABLE habits ADD COLUMN history BLOB")
+        backfill_history(db)
+    if "trend_last_period" not in _columns(db, "habits"):
+        for column, column_type in zip(TREND_COLUMNS, ["INTEGER", "INTEGER", "BLOB", "REAL", "INTEGER"]):
+            cur.execute(f"ALTER TABLE habits ADD COLUMN {column} {column_type}")
+        backfill_trends(db)
     cur.execute("""CREATE TABLE IF NOT EXISTS increments (
             incremented_at TEXT, 
-            habitName TEXT,
+            habit_id INTEGER,
             streak INTEGER,
-            FOREIGN KEY (habitName) REFERENCES habit(name))""")
+            FOREIGN KEY (habit_id) REFERENCES habits(habit_id))""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_increments_habit_id ON increments (habit_id, streak)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_habits_periodicity ON habits (LOWER(periodicity), name)") #paging per periodicity
+    cur.execute("""CREATE TABLE IF NOT EXISTS deleted_habits (
+            habit_id INTEGER PRIMARY KEY,
+            name TEXT,
+            description TEXT,
+            periodicity TEXT,
+            created_at TEXT,
+            current_streak INT,
+            last_increment_date TEXT,
+            deleted_at TEXT)""")
     db.commit()
+    create_search_index(db)
 
 
+def create_search_index(db):
+    """
+    Creates the FTS5 index used by search_habits() if it does not exist yet.
+    The index is an external content table over habits; triggers keep it in sync with every insert, delete and
+    rename, so add_habit(), delete_habit() and the archive module do not have to maintain it themselves.
+    If SQLite was built without FTS5 nothing is created and search_habits() falls back to a LIKE query.
+
+    :param db: The database connection object.
+    :return: None
+    """
+    cur = db.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'habits_fts'")
+    if cur.fetchone():
+        return
+    try:
+        cur.execute("""CREATE VIRTUAL TABLE habits_fts USING fts5(
+            name, description, content='habits', content_rowid='habit_id', prefix='2 3')""")
+    except sqlite3.OperationalError: #SQLite was built without FTS5
+        return
+    cur.execute("""CREATE TRIGGER habits_fts_insert AFTER INSERT ON habits BEGIN
+        INSERT INTO habits_fts (rowid, name, description) VALUES (new.habit_id, new.name, new.description);
+        END""")
+    cur.execute("""CREATE TRIGGER habits_fts_delete AFTER DELETE ON habits BEGIN
+        INSERT INTO habits_fts (habits_fts, rowid, name, description) VALUES ('delete', old.habit_id, old.name, old.description);
+        END""")
+    cur.execute("""CREATE TRIGGER habits_fts_update AFTER UPDATE OF name, description ON habits BEGIN
+        INSERT INTO habits_fts (habits_fts, rowid, name, description) VALUES ('delete', old.habit_id, old.name, old.description);
+        INSERT INTO habits_fts (rowid, name, description) VALUES (new.habit_id, new.name, new.description);
+        END""")
+    cur.execute("INSERT INTO habits_fts (habits_fts) VALUES ('rebuild')") #indexes habits that existed before the index
+    db.commit()
+
+
+def _columns(db, table):
+    return [row[1] for row in db.execute(f"PRAGMA table_info({table})")]
+
+
+def backfill_history(db):
+    """
+    Builds the history bitset of every habit from its increments. Used once when the history column is added.
+
+    :param db: The database connection object.
+    :return: None
+    """
+    cur = db.cursor()
+    histories = {}
+    cur.execute("""SELECT h.habit_id, h.periodicity, h.created_at, i.incremented_at
+        FROM increments i JOIN habits h ON h.habit_id = i.habit_id""")
+    for habit_id, periodicity, created_at, incremented_at in cur.fetchall():
+        histories[habit_id] = mark_completed(histories.get(habit_id), period_index(periodicity, created_at, incremented_at))
+    cur.executemany("UPDATE habits SET history = ? WHERE habit_id = ?", [(history, habit_id) for habit_id, history in histories.items()])
+    db.commit()
+
+
+def backfill_trends(db):
+    """
+    Builds the trend statistics of every habit from its increments. Used once when the trend columns are added.
+
+    :param db: The database connection object.
+    :return: None
+    """
+    cur = db.cursor()
+    trends = {}
+    cur.execute("""SELECT h.habit_id, h.periodicity, h.created_at, i.incremented_at
+        FROM increments i JOIN habits h ON h.habit_id = i.habit_id ORDER BY i.incremented_at""")
+    for habit_id, periodicity, created_at, incremented_at in cur.fetchall():
+        trends[habit_id] = update_trend(trends.get(habit_id), period_index(periodicity, created_at, incremented_at))
+    cur.executemany(f"UPDATE habits SET {', '.join(column + ' = ?' for column in TREND_COLUMNS)} WHERE habit_id = ?",
+                    [(*to_row(trend), habit_id) for habit_id, trend in trends.items()])
+    db.commit()
+
+
+def migrate_habit_ids(db):
+    """
+    Migrates a database that uses the habit name as key in both tables to integer habit_id keys.
+    The tables are rebuilt in a single transaction; increments that reference a non-existing habit are dropped.
+
+    :param db: The database connection object.
+    :return: None
+    """
+    cur = db.cursor()
+    cur.execute("BEGIN")
+    try:
+        cur.execute("""CREATE TABLE habits_new (
+            name TEXT UNIQUE,
+            description TEXT,
+            periodicity TEXT,
+            created_at TEXT,
+            current_streak INT,
+            last_increment_date TEXT,
+            habit_id INTEGER PRIMARY KEY AUTOINCREMENT)""")
+        cur.execute("""INSERT INTO habits_new (name, description, periodicity, created_at, current_streak, last_increment_date)
+            SELECT name, description, periodicity, created_at, current_streak, last_increment_date FROM habits""")
+        cur.execute("DROP TABLE habits")
+        cur.execute("ALTER TABLE habits_new RENAME TO habits")
+
+        cur.execute("""CREATE TABLE increments_new (
+            incremented_at TEXT,
+            habit_id INTEGER,
+            streak INTEGER,
+            FOREIGN KEY (habit_id) REFERENCES habits(habit_id))""")
+        cur.execute("""INSERT INTO increments_new (incremented_at, habit_id, streak)
+            SELECT i.incremented_at, h.habit_id, i.streak FROM increments i JOIN habits h ON h.name = i.habitName""")
+        cur.execute("DROP TABLE increments")
+        cur.execute("ALTER TABLE increments_new RENAME TO increments")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def get_habit_id(db, name):
+    """
+    Returns the integer habit_id for a habit name.
+    Ids are cached on HabitDB connections; other connections query the habits table on every call.
+
+    :param db: The database connection object.
+    :param name: The name of the habit.
+    :return: The habit_id of the habit.
+    :raises ValueError: If the habit with the specified name does not exist in the database.
+    """
+    cache = getattr(db, "habit_ids", None)
+    if cache is not None and name in cache:
+        return cache[name]
+
+    result = db.execute("SELECT habit_id FROM habits WHERE name = ?", (name,)).fetchone()
+    if not result:
+        raise ValueError(f"Habit '{name}' does not exist.")
+    if cache is not None:
+        cache[name] = result[0]
+    return result[0]
+
+
+def _forget_habit_id(db, name):
+    cache = getattr(db, "habit_ids", None)
+    if cache is not None:
+        cache.pop(name, None)
+
+
+def set_durability(db, level, journal_path=None, **options):
+    """
+    Sets the durability level of add_habit(), increment_habit() and delete_habit() for a connection, see the durability module.
+    Switching to buffered mode first replays the records of the journal that did not reach the database before a crash.
+
+    :param db: A connection returned by get_db().
+    :param level: One of "strict", "group" or "buffered".
+    :param journal_path: The path of the journal file, required in buffered mode.
+    :param options: window, max_pending, fsync_batch and fsync_interval, see durability.Durability.
+    :return: The number of replayed journal records.
+    :raises ValueError: If the level is unknown or buffered mode is requested without a journal path.
+    """
+    state = Durability(level, journal_path=journal_path, **options)
+    flush(db)
+    if db.durability is not None:
+        db.durability.close()
+        db.durability = None
+    if level != BUFFERED:
+        db.durability = state
+        return 0
+
+    cur = db.cursor()
+    cur.execute("CREATE TABLE IF NOT EXISTS journal_state (seq INTEGER)")
+    cur.execute("SELECT seq FROM journal_state")
+    result = cur.fetchone()
+    if result is None:
+        cur.execute("INSERT INTO journal_state (seq) VALUES (0)")
+    applied = result[0] if result else 0
+
+    #records with a higher seq were acknowledged but not committed, they are applied in a single transaction
+    operations = {"add_habit": add_habit, "increment_habit": increment_habit, "delete_habit": delete_habit}
+    records = [record for record in state.read_journal() if record[0] > applied]
+    db.durability = Durability(GROUP, window=float("inf"), max_pending=float("inf"))
+    try:
+        for seq, operation, args in records:
+            try:
+                operations[operation](db, *args)
+            except (ValueError, sqlite3.IntegrityError):
+                pass #the habit was changed by another connection in the meantime, the record cannot be applied
+            applied = seq
+        cur.execute("UPDATE journal_state SET seq = ?", (applied,))
+        db.commit()
+    finally:
+        db.durability = None
+
+    state.seq = applied
+    state.open_journal()
+    state.committed()
+    db.durability = state
+    return len(records)
+
+
+def _journal(db, operation, args):
+    state = getattr(db, "durability", None)
+    if state is not None and state.journal is not None:
+        seq = state.append(operation, args)
+        db.execute("UPDATE journal_state SET seq = ?", (seq,)) #committed together with the write, makes replay idempotent
+
+
+def _commit(db):
+    state = getattr(db, "durability", None)
+    if state is None or state.commit_due():
+        db.commit()
+        if state is not None:
+            state.committed()
+    elif state.pending == 1 and state.window != float("inf"):
+        #the first waiting write starts the window, the writes are committed when it ends even if no other write follows
+        state.start_timer(_commit_expired, db, state)
+
+
+def _commit_expired(db, state):
+    with db.lock:
+        if db.durability is not state or not state.pending: #committed in the meantime or the connection was closed
+            return
+        try:
+            flush(db)
+        except sqlite3.Error:
+            logger.exception("Group commit failed, retrying in %s seconds.", state.window)
+            state.start_timer(_commit_expired, db, state)
+
+
+@_serialized
+def flush(db):
+    """
+    Commits all writes that are waiting for a group commit and fsyncs the journal.
+    Code that commits or rolls back its own transactions on a connection returned by get_db() has to call flush()
+    before it starts them and commit through flush(), otherwise it commits or discards acknowledged writes behind
+    the back of the durability settings.
+
+    :param db: The database connection object.
+    :return: None
+    """
+    db.commit()
+    state = getattr(db, "durability", None)
+    if state is not None:
+        state.committed()
+        state.sync()
+
+
+@_serialized
 def add_habit(db, name, description, periodicity, created_at, last_increment_date=None): #last_increment_date can be added for testing purposes
     """
     Add a new habit to the database.
@@ -59,24 +420,50 @@ def add_habit(db, name, description, periodicity, created_at, last_increment_dat
     :return: None
     """
     cur = db.cursor()
-    cur.execute("INSERT INTO habits VALUES (?, ?, ?, ?, ?, ?)", (name, description, periodicity, created_at, 0, last_increment_date))
-    db.commit()
+    cur.execute("""INSERT INTO habits (name, description, periodicity, created_at, current_streak, last_increment_date)
+        VALUES (?, ?, ?, ?, ?, ?)""", (name, description, periodicity, created_at, 0, last_increment_date))
+    _journal(db, "add_habit", (name, description, periodicity, created_at, last_increment_date))
+    _commit(db)
+    cache = getattr(db, "habit_ids", None)
+    if cache is not None:
+        cache[name] = cur.lastrowid
 
 
+@_serialized
 def increment_habit(db, name, event_timestamp, streak):
     """
     Inserts a new increment event into the increments table and updates the habit table to reflect the new streak value.
+    The period of the increment is marked as completed in the habit's history bitset (see the history module)
+    and applied to its rolling statistics (see the trends module).
 
     :param db: The database connection object.
     :param name: The name of the habit.
     :param event_timestamp: The timestamp of the increment event.
     :param streak: The updated streak value to be recorded for the habit.
     :return: None
+    :raises ValueError: If the habit with the specified name does not exist in the database.
     """
+    habit_id = get_habit_id(db, name)
     cur = db.cursor()
-    cur.execute("INSERT INTO increments (incremented_at, habitName, streak) VALUES (?, ?, ?)", (event_timestamp, name, streak))
-    cur.execute("""UPDATE habits SET current_streak = ?, last_increment_date = ? WHERE name = ?""", (streak, event_timestamp, name))
-    db.commit()
+    sql = f"SELECT periodicity, created_at, history, {', '.join(TREND_COLUMNS)} FROM habits WHERE habit_id = ?"
+    result = cur.execute(sql, (habit_id,)).fetchone()
+    if not result: #the cached id belongs to a habit that was deleted through another connection and maybe added again
+        _forget_habit_id(db, name)
+        habit_id = get_habit_id(db, name)
+        result = cur.execute(sql, (habit_id,)).fetchone()
+        if not result:
+            raise ValueError(f"Habit '{name}' does not exist.")
+    periodicity, created_at, history, *trend = result
+    period = period_index(periodicity, created_at, event_timestamp)
+    history = mark_completed(history, period)
+    trend = update_trend(from_row(*trend), period)
+    cur.execute(f"""UPDATE habits SET current_streak = ?, last_increment_date = ?, history = ?,
+        {', '.join(column + ' = ?' for column in TREND_COLUMNS)} WHERE habit_id = ?""",
+                (streak, event_timestamp, history, *to_row(trend), habit_id))
+    cur.execute("INSERT INTO increments (incremented_at, habit_id, streak) VALUES (?, ?, ?)", (event_timestamp, habit_id, streak))
+    _journal(db, "increment_habit", (name, event_timestamp, streak))
+    _commit(db)
+    notify("increment", db, name, event_timestamp, streak)
 
 
 
@@ -106,6 +493,18 @@ def load_habit(db, name):
     }
 
 
+def habit_exists(db, name):
+    """
+    Checks whether a habit with exactly the given name exists.
+
+    :param db: The database connection object.
+    :param name: The name of the habit.
+    :return: True if the habit exists, False otherwise.
+    """
+    return db.execute("SELECT 1 FROM habits WHERE name = ?", (name,)).fetchone() is not None
+
+
+@_serialized
 def delete_habit(db, name):
     """
     Delete all database records for a given habit from the increments and habits table.
@@ -114,7 +513,56 @@ def delete_habit(db, name):
     :param name: The name of the habit to be deleted.
     :return: None
     """
+    try:
+        habit_id = get_habit_id(db, name)
+    except ValueError:
+        return
     cur = db.cursor()
-    cur.execute("DELETE FROM increments WHERE habitName = ?", (name,))
-    cur.execute("DELETE FROM habits WHERE name = ?", (name,))
-    db.commit()
\ No newline at end of file
+    cur.execute("DELETE FROM habits WHERE habit_id = ?", (habit_id,))
+    if cur.rowcount == 0: #the cached id is stale, the habit may have been added again through another connection
+        _forget_habit_id(db, name)
+        try:
+            habit_id = get_habit_id(db, name)
+        except ValueError:
+            return
+        cur.execute("DELETE FROM habits WHERE habit_id = ?", (habit_id,))
+    cur.execute("DELETE FROM increments WHERE habit_id = ?", (habit_id,))
+    _journal(db, "delete_habit", (name,))
+    _commit(db)
+    _forget_habit_id(db, name)
+    notify("delete", db, name)
+
+
+def search_habits(db, query, limit=10):
+    """
+    Searches habits by name and description, e.g. to autocomplete habit names.
+    Every word of the query is matched as a prefix and matches in the name rank higher than matches in the description.
+    If fewer than limit habits contain all words, habits that share the first three letters of any longer word are
+    added, which also finds names with a typo towards the end of a word.
+
+    :param db: The database connection object.
+    :param query: The text entered by the user.
+    :param limit: The maximum number of results.
+    :return: A list of habit names ordered by relevance.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return []
+
+    cur = db.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'habits_fts'")
+    if not cur.fetchone():
+        pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        cur.execute("SELECT name FROM habits WHERE name LIKE ? ESCAPE '\\' ORDER BY name LIMIT ?", (pattern, limit))
+        return [row[0] for row in cur.fetchall()]
+
+    sql = """SELECT h.name FROM habits_fts JOIN habits h ON h.habit_id = habits_fts.rowid
+        WHERE habits_fts MATCH ? ORDER BY bm25(habits_fts, 10.0, 1.0) LIMIT ?"""
+    cur.execute(sql, (" ".join(f'"{word}"*' for word in words), limit))
+    results = [row[0] for row in cur.fetchall()]
+
+    stems = [word[:3] for word in words if len(word) > 3]
+    if stems and len(results) < limit:
+        cur.execute(sql, (" OR ".join(f'"{stem}"*' for stem in stems), limit + len(results)))
+        results += [row[0] for row in cur.fetchall() if row[0] not in results][:limit - len(results)]
+    return results
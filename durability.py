@@ -0,0 +1,139 @@
+"""
+The durability module holds the state behind the durability levels of a database connection (see db.set_durability()).
+
+strict:   Every add_habit(), increment_habit() and delete_habit() is committed before it returns. Nothing acknowledged is lost.
+group:    Writes are committed together once max_pending writes are waiting or window seconds have passed since
+          the first waiting write. A timer commits them when the window ends, also if no further write follows.
+          A crash loses at most the writes since the last commit, i.e. fewer than max_pending.
+          The archive module commits right away, together with all waiting writes.
+buffered: Every write is appended to a journal file before it returns and the SQLite transaction is committed in
+          groups like above. The journal is flushed to the operating system on every write, so a crash of the
+          process loses nothing. It is fsynced every fsync_batch writes or fsync_interval seconds, which bounds
+          the writes lost on a power failure. The journal is replayed into SQLite when buffered mode is enabled again.
+"""
+
+import json
+import os
+import threading
+import time
+
+STRICT = "strict"
+GROUP = "group"
+BUFFERED = "buffered"
+LEVELS = (STRICT, GROUP, BUFFERED)
+
+
+class Durability:
+    def __init__(self, level=STRICT, window=0.05, max_pending=100, journal_path=None, fsync_batch=64, fsync_interval=0.05):
+        """
+        Durability settings and write counters of a connection.
+
+        :param level: One of "strict", "group" or "buffered".
+        :param window: Maximum seconds a write waits for its commit in group and buffered mode.
+        :param max_pending: Maximum number of uncommitted writes in group and buffered mode.
+        :param journal_path: The path of the journal file, required in buffered mode.
+        :param fsync_batch: Maximum number of journal records between two fsyncs.
+        :param fsync_interval: Maximum seconds between two fsyncs of the journal.
+        :raises ValueError: If the level is unknown or buffered mode is requested without a journal path.
+        """
+        if level not in LEVELS:
+            raise ValueError(f"Unknown durability level '{level}'.")
+        if level == BUFFERED and not journal_path:
+            raise ValueError("Buffered durability requires a journal path.")
+        self.level = level
+        self.window = window
+        self.max_pending = max_pending
+        self.journal_path = journal_path
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+
+        self.seq = 0
+        self.pending = 0
+        self.unsynced = 0
+        self.last_commit = self.last_fsync = time.monotonic()
+        self.journal = None
+        self.timer = None
+
+    def commit_due(self):
+        """
+        Counts a write and returns True if the transaction has to be committed now.
+        """
+        if self.level == STRICT:
+            return True
+        self.pending += 1
+        return self.pending >= self.max_pending or time.monotonic() - self.last_commit >= self.window
+
+    def committed(self):
+        """
+        Resets the counters after a commit. All journal records are part of the database now, so the journal is emptied.
+        """
+        self.pending = 0
+        self.last_commit = time.monotonic()
+        self.cancel_timer()
+        if self.journal is not None:
+            self.journal.seek(0)
+            self.journal.truncate()
+            self.unsynced = 0
+
+    def start_timer(self, function, *args):
+        """
+        Calls function(*args) on a timer thread once the window has passed.
+        """
+        self.cancel_timer()
+        self.timer = threading.Timer(self.window, function, args)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def open_journal(self):
+        self.journal = open(self.journal_path, "a+", encoding="utf-8")
+
+    def read_journal(self):
+        """
+        Reads all complete records of the journal. A torn last line from a crash during a write was never acknowledged
+        and is skipped.
+
+        :return: A list of (seq, operation, args) tuples.
+        """
+        if not os.path.exists(self.journal_path):
+            return []
+        records = []
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                records.append((record["seq"], record["op"], record["args"]))
+        return records
+
+    def append(self, operation, args):
+        """
+        Appends a record to the journal and hands it to the operating system. Fsyncs the journal if the batch is full.
+
+        :return: The sequence number of the record.
+        """
+        self.seq += 1
+        self.journal.write(json.dumps({"seq": self.seq, "op": operation, "args": list(args)}) + "\n")
+        self.journal.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_batch or time.monotonic() - self.last_fsync >= self.fsync_interval:
+            self.sync()
+        return self.seq
+
+    def sync(self):
+        if self.journal is not None and self.unsynced:
+            os.fsync(self.journal.fileno())
+            self.unsynced = 0
+        self.last_fsync = time.monotonic()
+
+    def close(self):
+        self.cancel_timer()
+        if self.journal is not None:
+            self.sync()
+            self.journal.close()
+            self.journal = None
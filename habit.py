@@ -1,4 +1,4 @@
-from db import add_habit, increment_habit, load_habit, delete_habit
+from storage import as_storage
 from datetime import datetime, timedelta
 
 
@@ -21,8 +21,8 @@ class Habit:
     def increment_streak(self, db, increment_date=None):
         """
         Increment or reset the streak based on the increment data and periodicity.
-        Calls increment_habit() which updates the habits and increments table.
-        :param db: The database connection object.
+        Calls increment_habit() of the storage backend which persists the increment.
+        :param db: The database connection or storage object.
         :param increment_date: Optional parameter that can be used to write unit test. Otherwise it is set to the current date.
         """
         if increment_date is None:
@@ -41,17 +41,17 @@ class Habit:
 
         self.last_increment_date = increment_date
 
-        increment_habit(db, self.name, increment_date.strftime("%Y-%m-%d %H:%M:%S"), self.current_streak) #persists the changes in db
+        as_storage(db).increment_habit(self.name, increment_date.strftime("%Y-%m-%d %H:%M:%S"), self.current_streak) #persists the changes in db
 
 
     def load(db, name):
         """
         Loads habit data for a requested habit from database and initializes a Habit object with it.
-        :param db: The database connection object.
+        :param db: The database connection or storage object.
         :param name: Name of the requested Habit object.
         :return: A Habit object.
         """
-        data = load_habit(db, name)
+        data = as_storage(db).load_habit(name)
         habit = Habit(data["name"], data["description"], data["periodicity"])
         habit.current_streak = data["current_streak"]
         habit.last_increment_date = datetime.strptime(data["last_increment_date"], "%Y-%m-%d %H:%M:%S") if data["last_increment_date"] else None
@@ -59,18 +59,18 @@ class Habit:
 
     def add(self, db):
         """
-        Inserts habit's details into database by calling the corresponding function from the db module.
-        :param db: The database connection object.
+        Inserts habit's details into database by calling the corresponding function of the storage backend.
+        :param db: The database connection or storage object.
         :return: True if the habit is successfully added to the database.
         """
-        add_habit(db, self.name, self.description, self.periodicity, self.created_at)
+        as_storage(db).add_habit(self.name, self.description, self.periodicity, self.created_at)
         return True
 
     def delete(db, name):
         """
-        Deletes data for a given habit from database by calling the corresponding function in the db module.
-        :param db: The database connection object.
+        Deletes data for a given habit from database by calling the corresponding function of the storage backend.
+        :param db: The database connection or storage object.
         :param name: The name of the habit to be deleted.
         :return: None
         """
-        delete_habit(db, name)
\ No newline at end of file
+        as_storage(db).delete_habit(name)
\ No newline at end of file
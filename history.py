@@ -0,0 +1,126 @@
+"""
+The history module stores the completion history of a habit as a bitset.
+
+Bit i of the bitset is set if the habit was completed in period i after its creation, where a period is a day for
+daily and a week for weekly habits. The bitset is kept in the history column of the habits table as a little-endian
+BLOB and is updated on every increment. Streaks and completion rates are calculated with integer bit operations
+instead of scanning the increments table.
+
+Note that the bitset records completed periods: a habit that was completed in two consecutive weeks counts as a
+streak of two, even if Habit.increment_streak() reset the streak because the increments were not exactly one week apart.
+"""
+
+from datetime import datetime
+
+PERIOD_DAYS = {"daily": 1, "weekly": 7}
+
+
+def _parse(timestamp):
+    if isinstance(timestamp, str):
+        return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+    return timestamp
+
+
+def period_index(periodicity, created_at, timestamp):
+    """
+    Returns the number of the period a timestamp falls into, counted from the creation of the habit.
+
+    :param periodicity: The periodicity of the habit, either "Daily" or "Weekly".
+    :param created_at: The datetime or timestamp string of the creation of the habit.
+    :param timestamp: The datetime or timestamp string to be converted.
+    :return: The period index, negative if the timestamp is before the creation of the habit.
+    """
+    days = (_parse(timestamp).date() - _parse(created_at).date()).days
+    return days // PERIOD_DAYS.get((periodicity or "").lower(), 1)
+
+
+def mark_completed(history, index):
+    """
+    Sets the bit of a period in a history BLOB.
+
+    :param history: The history BLOB or None for an empty history.
+    :param index: The period index.
+    :return: The updated history as bytes.
+    """
+    history = bytearray(history or b"")
+    if index < 0: #increments before the creation of the habit cannot be represented
+        return bytes(history)
+    if len(history) <= index // 8:
+        history.extend(bytes(index // 8 + 1 - len(history)))
+    history[index // 8] |= 1 << (index % 8)
+    return bytes(history)
+
+
+def to_bits(history):
+    return int.from_bytes(history or b"", "little")
+
+
+def longest_run(bits):
+    """
+    Returns the length of the longest run of set bits.
+    Every iteration shortens all runs by one, so the loop runs once per period of the longest run.
+    """
+    length = 0
+    while bits:
+        bits &= bits >> 1
+        length += 1
+    return length
+
+
+def run_ending_at(bits, index):
+    """
+    Returns the length of the run of set bits that ends at the given index.
+    """
+    if index < 0:
+        return 0
+    gaps = ~bits & ((1 << (index + 1)) - 1) #unset bits up to and including index
+    return index + 1 - gaps.bit_length()
+
+
+def count_bits(bits):
+    return bin(bits).count("1")
+
+
+def history_stats(history, periodicity, created_at, now=None):
+    """
+    Calculates streak and completion statistics from a history BLOB.
+
+    :param history: The history BLOB.
+    :param periodicity: The periodicity of the habit, either "Daily" or "Weekly".
+    :param created_at: The datetime or timestamp string of the creation of the habit.
+    :param now: The reference datetime, defaults to the current time.
+    :return: A dictionary with the following keys:
+             - "completed_periods": The number of periods the habit was completed in.
+             - "longest_streak": The longest run of consecutive completed periods.
+             - "current_streak": The run of completed periods ending in the current period, or in the previous
+               period if the current one is not completed yet.
+             - "completion_rate": The share of periods since the creation of the habit that were completed.
+    """
+    bits = to_bits(history)
+    current = period_index(periodicity, created_at, now or datetime.now())
+    current_streak = run_ending_at(bits, current)
+    if not current_streak:
+        current_streak = run_ending_at(bits, current - 1)
+    completed = count_bits(bits)
+    return {
+        "completed_periods": completed,
+        "longest_streak": longest_run(bits),
+        "current_streak": current_streak,
+        "completion_rate": completed / (current + 1) if current >= 0 else 0.0
+    }
+
+
+def get_history_stats(db, name, now=None):
+    """
+    Loads the history of a habit from the database and calculates its statistics, see history_stats().
+
+    :param db: The database connection object.
+    :param name: The name of the habit.
+    :param now: The reference datetime, defaults to the current time.
+    :return: A dictionary with the statistics of the habit.
+    :raises ValueError: If the habit with the specified name does not exist in the database.
+    """
+    result = db.execute("SELECT history, periodicity, created_at FROM habits WHERE name = ?", (name,)).fetchone()
+    if not result:
+        raise ValueError(f"Habit '{name}' does not exist.")
+    return history_stats(*result, now=now)
@@ -1,15 +1,86 @@
 import questionary
-from db import get_db
+from prompt_toolkit.completion import Completer, Completion, ThreadedCompleter
+from background import BackgroundDB, HabitPager, wait_for
+from db import get_db, search_habits, habit_exists
 from habit import Habit
-from analytics import get_all_habits, get_habits_by_periodicity, calculate_longest_streak, calculate_longest_streak_all
+from analytics import calculate_longest_streak, calculate_longest_streak_all, get_most_struggling_habits
 
 
-def cli():
+class HabitCompleter(Completer):
+    def __init__(self, background):
+        """
+        Autocompletes habit names in questionary prompts by searching the database while the user types.
+        The search runs on the background connection, so typing never waits for the database.
+
+        :param background: The BackgroundDB used for the search.
+        """
+        self.background = background
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor
+        for name in self.background.run(search_habits, text):
+            yield Completion(name, start_position=-len(text))
+
+
+def select_habit(background, message):
+    """
+    Lets the user pick an existing habit. Matching habits are suggested while typing; if the entered text is not
+    exactly the name of a habit, the best matches of the search are offered for selection.
+
+    :param background: The BackgroundDB used for the search.
+    :param message: The question shown to the user.
+    :return: The name of the selected habit or None if the user entered nothing.
+    """
+    while True:
+        text = questionary.autocomplete(message, choices=[], completer=ThreadedCompleter(HabitCompleter(background))).ask()
+        if not text or not text.strip():
+            return None
+
+        #the exact name is checked first, the search ignores names without letters or digits and returns only the top matches
+        if wait_for(background.submit(habit_exists, text), "Searching habits"):
+            return text
+        matches = wait_for(background.submit(search_habits, text), "Searching habits")
+        if not matches:
+            print(f"No habit matches '{text}'.")
+            continue
+
+        choice = questionary.select(message="Select a habit:", choices=matches + ["Search again"]).ask()
+        if choice != "Search again":
+            return choice
+
+
+def show_pages(pager, title, empty_message, describe):
+    """
+    Prints habits page by page and asks before showing the next page.
+
+    :param pager: The HabitPager that fetches the pages.
+    :param title: The line printed before the first habit.
+    :param empty_message: The line printed if there are no habits.
+    :param describe: Function that returns the line printed for a habit dictionary.
+    """
+    page = pager.next_page()
+    if not page:
+        print(empty_message)
+        return
+    print(title)
+    while page:
+        for habit in page:
+            print(describe(habit))
+        if not pager.has_more or not questionary.confirm("Show more habits?").ask():
+            break
+        page = pager.next_page()
+
+
+def cli(name="main.db"):
     """
     Function contains the command-line interface using questionary to create a menu the user can interact with.
+    Habit lists, searches and analytics run on a background connection, so the menus stay responsive for large databases.
+
+    :param name: The name of the database file (default is "main.db").
     """
     try:
-        db = get_db() #creates a database to store the habits
+        db = get_db(name) #creates a database to store the habits
+        background = BackgroundDB(name) #second connection used off the UI thread
     except Exception as e:
         print(f"Failed to connect to database:{e}")
         return
@@ -68,7 +139,9 @@ def cli():
                         print(f"Database error while adding habit: {e}")
 
                 elif manage_choice == "Increment existing habit":
-                    name = questionary.text("What's the name of your habit?").ask()
+                    name = select_habit(background, "What's the name of your habit?")
+                    if name is None:
+                        continue
                     try:
                         habit = Habit.load(db, name)
                         habit.increment_streak(db)
@@ -79,7 +152,9 @@ def cli():
                         print(f"Database error while incrementing habit: {e}")
 
                 elif manage_choice == "Delete existing habit":
-                    name = questionary.text("Enter the name of the habit to delete: ").ask()
+                    name = select_habit(background, "Enter the name of the habit to delete: ")
+                    if name is None:
+                        continue
                     try:
                         habit = Habit.load(db, name)
                         confirm = questionary.confirm(
@@ -109,52 +184,39 @@ def cli():
                         "Show all weekly habits",
                         "Show longest streak for a specific habit",
                         "Show longest streak across all habits",
+                        "Show habits you are struggling with most",
                         "Go back",
                     ],
                 ).ask()
 
                 if analysis_choice == "Show all tracked habits":
                     try:
-                        all_habits = get_all_habits(db)
-                        if all_habits:
-                            print("Tracked habits:")
-                            for habit in all_habits: #loops through all habits returned by get_all_habits() and prints them to the console
-                                print(
-                                    f"Habit: {habit['name']}, Periodicity: {habit['periodicity']}, Current Streak: {habit['current_streak']}"
-                                )
-                        else:
-                            print("No habits are currently being tracked.")
+                        #fetches the habits page by page, the next page loads while the current one is shown
+                        show_pages(HabitPager(background), "Tracked habits:", "No habits are currently being tracked.",
+                                   lambda habit: f"Habit: {habit['name']}, Periodicity: {habit['periodicity']}, Current Streak: {habit['current_streak']}")
                     except Exception as e:
                         print(f"Database error while fetching tracked habits: {e}")
 
                 elif analysis_choice == "Show all daily habits":
                     try:
-                        daily_habits = get_habits_by_periodicity(db, "daily")
-                        if daily_habits:
-                            print("Daily habits:")
-                            for habit in daily_habits:
-                                print(f" - {habit}")
-                        else:
-                            print("No daily habits are currently being tracked.")
+                        show_pages(HabitPager(background, periodicity="daily"), "Daily habits:",
+                                   "No daily habits are currently being tracked.", lambda habit: f" - {habit['name']}")
                     except Exception as e:
                         print(f"Database error while fetching daily habits: {e}")
 
                 elif analysis_choice == "Show all weekly habits":
                     try:
-                        weekly_habits = get_habits_by_periodicity(db, "weekly")
-                        if weekly_habits:
-                            print("Weekly habits:")
-                            for habit in weekly_habits:
-                                print(f" - {habit}")
-                        else:
-                            print("No weekly habits are currently being tracked.")
+                        show_pages(HabitPager(background, periodicity="weekly"), "Weekly habits:",
+                                   "No weekly habits are currently being tracked.", lambda habit: f" - {habit['name']}")
                     except Exception as e:
                         print(f"Database error while fetching weekly habits: {e}")
 
                 elif analysis_choice == "Show longest streak for a specific habit":
-                    habit_name = questionary.text("Enter the name of the habit: ").ask()
+                    habit_name = select_habit(background, "Enter the name of the habit: ")
+                    if habit_name is None:
+                        continue
                     try:
-                        longest_streak = calculate_longest_streak(db, habit_name)
+                        longest_streak = wait_for(background.submit(calculate_longest_streak, habit_name), "Calculating")
                         print(f"The longest streak for habit '{habit_name}' is {longest_streak} days.")
                     except ValueError:
                         print(f"Error: Habit '{habit_name}' does not exist.")
@@ -163,7 +225,7 @@ def cli():
 
                 elif analysis_choice == "Show longest streak across all habits":
                     try:
-                        longest_streak_habits = calculate_longest_streak_all(db)
+                        longest_streak_habits = wait_for(background.submit(calculate_longest_streak_all), "Calculating")
 
                         if longest_streak_habits:
                             print("The following habit(s) have the longest streak:")
@@ -174,6 +236,21 @@ def cli():
                     except Exception as e:
                         print(f"Database error while fetching the longest streak across all habits: {e}")
 
+                elif analysis_choice == "Show habits you are struggling with most":
+                    try:
+                        struggling_habits = wait_for(background.submit(get_most_struggling_habits), "Calculating")
+                        if struggling_habits:
+                            print("You are struggling most with the following habit(s):")
+                            for habit in struggling_habits:
+                                print(
+                                    f" - '{habit['habit']}': completed {habit['completion_rate_30d']:.0%} of the last 30 days, "
+                                    f"consistency {habit['consistency']:.2f}, streak broken {habit['breaks']} times."
+                                )
+                        else:
+                            print("No habits are currently being tracked.")
+                    except Exception as e:
+                        print(f"Database error while fetching the habits you are struggling with: {e}")
+
 
                 elif analysis_choice == "Go back":
                     break
@@ -182,6 +259,9 @@ def cli():
             print("Thanks for using the Habit Tracker App.")
             break
 
+    background.close()
+    db.close()
+
 
 if __name__ == '__main__':
     cli()
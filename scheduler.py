@@ -0,0 +1,256 @@
+"""
+The scheduler module keeps track of when each habit has to be incremented next to keep its streak.
+
+A habit's streak continues only if it is incremented exactly one period after its last increment (see
+Habit.increment_streak()), so every incremented habit has a due day: it becomes due at the start of that day
+and its streak breaks at the end of it. The ReminderScheduler keeps these deadlines in a heap ordered by the end of
+the due day and updates it on every increment, so queries only touch the habits they return.
+"""
+
+import asyncio
+import heapq
+import threading
+from datetime import datetime, timedelta
+from analytics import get_all_habits
+from db import add_listener, remove_listener, load_habit
+
+PERIODS = {"daily": timedelta(days=1), "weekly": timedelta(weeks=1)}
+
+
+def next_deadline(periodicity, last_increment_date):
+    """
+    Calculates the day on which a habit has to be incremented to continue its streak.
+
+    :param periodicity: The periodicity of the habit, either "Daily" or "Weekly".
+    :param last_increment_date: The datetime or timestamp string of the last increment.
+    :return: A tuple (due_from, due_until) with the start and the end of the due day, or None if the habit
+             was never incremented or has an unknown periodicity.
+    """
+    period = PERIODS.get((periodicity or "").lower())
+    if not last_increment_date or not period:
+        return None
+    if isinstance(last_increment_date, str):
+        last_increment_date = datetime.strptime(last_increment_date, "%Y-%m-%d %H:%M:%S")
+    due_from = datetime.combine(last_increment_date.date() + period, datetime.min.time())
+    return due_from, due_from + timedelta(days=1)
+
+
+class ReminderScheduler:
+    def __init__(self):
+        """
+        Priority queue of habit deadlines.
+        Deadlines that are replaced by a newer increment stay in the heap until they reach the top and are skipped
+        then, so every update is a single O(log n) push.
+        """
+        self._heap = [] #entries are (due_until, due_from, name)
+        self._deadlines = {} #name -> (due_until, due_from) of the current deadline
+        self._periodicities = {}
+        self._overdue = {} #name -> due_until of habits whose streak is already broken
+        self._notified = set() #(name, due_until) of deadlines a "due" event was emitted for
+        self._lock = threading.Lock()
+        self._db = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def load(self, db):
+        """
+        Adds all habits of the database to the scheduler.
+
+        :param db: The database connection object.
+        :return: None
+        """
+        for habit in get_all_habits(db):
+            self.track(habit["name"], habit["periodicity"], habit["last_increment_date"])
+
+    def attach(self, db):
+        """
+        Loads all habits and keeps the scheduler up to date with increments and deletions made through the db module
+        on this connection. Changes made through other connections are not tracked.
+
+        :param db: The database connection object.
+        :return: None
+        """
+        self.load(db)
+        add_listener("increment", self._on_increment)
+        add_listener("delete", self._on_delete)
+        self._db = db
+
+    def detach(self):
+        """
+        Stops listening to increments and deletions.
+        """
+        if self._db is not None:
+            remove_listener("increment", self._on_increment)
+            remove_listener("delete", self._on_delete)
+            self._db = None
+
+    def _on_increment(self, db, name, event_timestamp, streak):
+        if db is not self._db: #the listeners are shared by all connections of the process
+            return
+        periodicity = self._periodicities.get(name)
+        if periodicity is None:
+            periodicity = load_habit(db, name)["periodicity"]
+        self.track(name, periodicity, event_timestamp)
+
+    def _on_delete(self, db, name):
+        if db is not self._db:
+            return
+        self.remove(name)
+
+    def track(self, name, periodicity, last_increment_date):
+        """
+        Adds or updates the deadline of a habit.
+
+        :param name: The name of the habit.
+        :param periodicity: The periodicity of the habit, either "Daily" or "Weekly".
+        :param last_increment_date: The datetime or timestamp string of the last increment, None if never incremented.
+        :return: None
+        """
+        deadline = next_deadline(periodicity, last_increment_date)
+        with self._lock:
+            self._periodicities[name] = periodicity
+            self._overdue.pop(name, None)
+            if deadline is None:
+                self._deadlines.pop(name, None)
+                return
+            due_from, due_until = deadline
+            if self._deadlines.get(name) == (due_until, due_from):
+                return #another increment in the same period, the heap already holds this deadline
+            self._deadlines[name] = (due_until, due_from)
+            heapq.heappush(self._heap, (due_until, due_from, name))
+            if len(self._heap) > 2 * len(self._deadlines) + 64:
+                self._compact()
+
+    def remove(self, name):
+        """
+        Removes a habit from the scheduler.
+
+        :param name: The name of the habit.
+        :return: None
+        """
+        with self._lock:
+            self._deadlines.pop(name, None)
+            self._periodicities.pop(name, None)
+            self._overdue.pop(name, None)
+
+    def _compact(self):
+        #rebuilds the heap without replaced deadlines, keeps its size proportional to the number of habits
+        self._heap = [(due_until, due_from, name) for name, (due_until, due_from) in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def _is_current(self, entry):
+        due_until, due_from, name = entry
+        return self._deadlines.get(name) == (due_until, due_from)
+
+    def _expire(self, now):
+        #moves every deadline that passed to the overdue habits, returns the newly overdue ones
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._is_current(entry):
+                due_until, due_from, name = entry
+                del self._deadlines[name]
+                self._overdue[name] = due_until
+                expired.append((name, due_until))
+        return expired
+
+    def _walk(self, until):
+        #visits only the heap entries with due_until <= until: a node's children are never due earlier than the node
+        found = set()
+        stack = [0] if self._heap else []
+        while stack:
+            index = stack.pop()
+            entry = self._heap[index]
+            if entry[0] > until:
+                continue
+            if self._is_current(entry):
+                found.add(entry) #a set, a deadline that was replaced and then set again is in the heap twice
+            stack.extend(child for child in (2 * index + 1, 2 * index + 2) if child < len(self._heap))
+        return sorted(found)
+
+    def due_within(self, horizon=timedelta(hours=1), now=None):
+        """
+        Returns the habits whose streak breaks within the given time span.
+
+        :param horizon: A timedelta, defaults to one hour.
+        :param now: The reference datetime, defaults to the current time.
+        :return: A list of (name, due_until) tuples ordered by deadline.
+        """
+        now = now or datetime.now()
+        with self._lock:
+            self._expire(now)
+            return [(name, due_until) for due_until, due_from, name in self._walk(now + horizon)]
+
+    def overdue(self, now=None):
+        """
+        Returns the habits whose streak is broken because they were not incremented on their due day.
+
+        :param now: The reference datetime, defaults to the current time.
+        :return: A list of (name, due_until) tuples ordered by deadline.
+        """
+        now = now or datetime.now()
+        with self._lock:
+            self._expire(now)
+            return sorted(((name, due_until) for name, due_until in self._overdue.items()), key=lambda item: item[1])
+
+    def poll(self, horizon=timedelta(hours=1), now=None):
+        """
+        Returns the events that occurred since the last poll. Every deadline produces at most one event of each kind.
+
+        :param horizon: A "due" event is emitted when a streak breaks within this time span.
+        :param now: The reference datetime, defaults to the current time.
+        :return: A list of (event, name, due_until) tuples where event is "due" or "overdue".
+        """
+        now = now or datetime.now()
+        with self._lock:
+            events = [("overdue", name, due_until) for name, due_until in self._expire(now)]
+            for due_until, due_from, name in self._walk(now + horizon):
+                if (name, due_until) not in self._notified:
+                    self._notified.add((name, due_until))
+                    events.append(("due", name, due_until))
+            self._notified = {key for key in self._notified if self._deadlines.get(key[0], (None,))[0] == key[1]}
+        return events
+
+    def start(self, callback, interval=60, horizon=timedelta(hours=1)):
+        """
+        Polls the scheduler on a background thread and calls callback(event, name, due_until) for every event.
+
+        :param callback: The function to be called for every event.
+        :param interval: Seconds between two polls.
+        :param horizon: See poll().
+        :return: None
+        """
+        def run():
+            while not self._stop_event.is_set():
+                for event in self.poll(horizon):
+                    callback(*event)
+                self._stop_event.wait(interval)
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread started with start().
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    async def run(self, callback, interval=60, horizon=timedelta(hours=1)):
+        """
+        Asyncio variant of start(). Polls the scheduler until the task is cancelled.
+
+        :param callback: The function to be called for every event, coroutine functions are awaited.
+        :param interval: Seconds between two polls.
+        :param horizon: See poll().
+        :return: None
+        """
+        while True:
+            for event in self.poll(horizon):
+                result = callback(*event)
+                if asyncio.iscoroutine(result):
+                    await result
+            await asyncio.sleep(interval)
@@ -0,0 +1,269 @@
+"""
+The snapshot module exports a read-only, memory-mapped copy of the habits table and its per-habit aggregates.
+
+Dashboards and other read-only consumers can open the snapshot file instead of the SQLite database.
+Every column is stored as a fixed-width array, so readers access the data in place through mmap and memoryview
+and several reader processes share the same pages of the operating system's page cache.
+
+File layout (all offsets are in bytes from the start of the file and aligned to 4 bytes):
+    header          magic, byte order, habit count, periodicity count and the offsets of all sections below
+    codes           one unsigned short per habit, index into the periodicity dictionary
+    current         one signed int per habit, the current streak
+    longest         one signed int per habit, the longest streak or -1 if the habit was never incremented
+    completions     one unsigned int per habit, the number of increments
+    nulls           one unsigned byte per habit, bit i is set if string column i (see STRING_COLUMNS) is NULL
+    name/description/created/last offsets
+                    count + 1 unsigned ints per string column pointing into the string pool
+    periodicity offsets
+                    periodicity count + 1 unsigned ints pointing into the string pool
+    strings         UTF-8 encoded string pool
+
+NULL strings are stored as empty strings in the pool and marked in the nulls column, so NULL and "" stay distinct.
+
+Habits are sorted by the UTF-8 bytes of their name, which allows name lookups by binary search.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b"HTSNAP03"
+HEADER = struct.Struct("<8sc3xII11I")
+NO_STREAK = -1
+STRING_COLUMNS = ("name", "description", "created_at", "last_increment_date", "periodicity")
+MAX_PERIODICITIES = 1 << 16 #codes are unsigned shorts
+
+
+def _align(offset):
+    return (offset + 3) & ~3
+
+
+def export_snapshot(db, path):
+    """
+    Writes a snapshot of all habits and their aggregates to the given path.
+    The file is written next to the target first and then moved into place, so readers that still have the
+    old snapshot mapped keep a consistent view.
+
+    :param db: The database connection object.
+    :param path: The path of the snapshot file.
+    :return: The number of habits written to the snapshot.
+    :raises ValueError: If the habits use more than MAX_PERIODICITIES different periodicities.
+    """
+    cur = db.cursor()
+    cur.execute("""
+        SELECT h.name, h.description, h.periodicity, h.created_at, h.current_streak, h.last_increment_date,
+               MAX(i.streak), COUNT(i.streak)
+        FROM habits h
+        LEFT JOIN increments i ON i.habit_id = h.habit_id
+        GROUP BY h.habit_id""")
+    rows = sorted(cur.fetchall(), key=lambda row: row[0].encode("utf-8"))
+
+    periodicities = {} #periodicity -> code, in insertion order
+    codes = array("H")
+    current = array("i")
+    longest = array("i")
+    completions = array("I")
+    nulls = array("B")
+    column_pools = [bytearray() for _ in range(4)]  # name, description, created_at, last_increment_date
+    column_ends = [array("I") for _ in range(4)]
+
+    for name, description, periodicity, created_at, current_streak, last_increment_date, max_streak, count in rows:
+        if periodicity not in periodicities:
+            if len(periodicities) == MAX_PERIODICITIES:
+                raise ValueError(f"A snapshot can hold at most {MAX_PERIODICITIES} different periodicities.")
+            periodicities[periodicity] = len(periodicities)
+        codes.append(periodicities[periodicity])
+        current.append(current_streak or 0)
+        longest.append(NO_STREAK if max_streak is None else max_streak)
+        completions.append(count)
+        values = (name, description, created_at, last_increment_date, periodicity)
+        nulls.append(sum(1 << column for column, value in enumerate(values) if value is None))
+        for column_pool, ends, value in zip(column_pools, column_ends, (name, description, created_at, last_increment_date)):
+            column_pool += (value or "").encode("utf-8")
+            ends.append(len(column_pool))
+
+    #every string column is stored contiguously in the pool, so the strings of habit i span offsets[i]:offsets[i + 1]
+    pool = bytearray()
+    string_columns = []
+    for column_pool, ends in zip(column_pools, column_ends):
+        base = len(pool)
+        string_columns.append(array("I", [base] + [base + end for end in ends]))
+        pool += column_pool
+
+    periodicity_offsets = array("I", [len(pool)])
+    for periodicity in periodicities:
+        pool += (periodicity or "").encode("utf-8")
+        periodicity_offsets.append(len(pool))
+
+    sections = [codes, current, longest, completions, nulls, *string_columns, periodicity_offsets, pool]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        position = _align(position)
+        offsets.append(position)
+        position += len(section) * getattr(section, "itemsize", 1)
+
+    byteorder = b"l" if sys.byteorder == "little" else b"b"
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, byteorder, len(rows), len(periodicities), *offsets))
+            for offset, section in zip(offsets, sections):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(bytes(section) if isinstance(section, bytearray) else section.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(rows)
+
+
+class HabitSnapshot:
+    def __init__(self, path):
+        """
+        Read-only view of a snapshot file written by export_snapshot().
+        The file is memory-mapped and the fixed-width columns are exposed as memoryviews, so no data is copied
+        until a value is requested.
+
+        :param path: The path of the snapshot file.
+        :raises ValueError: If the file is not a snapshot or was written on a machine with a different byte order.
+        """
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        self._views = []
+
+        if len(self._mmap) < HEADER.size:
+            self.close()
+            raise ValueError(f"'{path}' is not a habit snapshot.")
+        magic, byteorder, count, periodicity_count, *offsets = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"'{path}' is not a habit snapshot.")
+        if byteorder != (b"l" if sys.byteorder == "little" else b"b"):
+            self.close()
+            raise ValueError(f"Snapshot '{path}' was written with a different byte order.")
+
+        self.count = count
+        self._codes = self._column(offsets[0], count, "H")
+        self._current = self._column(offsets[1], count, "i")
+        self._longest = self._column(offsets[2], count, "i")
+        self._completions = self._column(offsets[3], count, "I")
+        self._nulls = self._column(offsets[4], count, "B")
+        self._names, self._descriptions, self._created, self._last = (
+            self._column(offset, count + 1, "I") for offset in offsets[5:9]
+        )
+        self._periodicity_offsets = self._column(offsets[9], periodicity_count + 1, "I")
+        self._strings = self._column(offsets[10], len(self._mmap) - offsets[10], "B")
+
+    def _column(self, offset, length, typecode):
+        itemsize = array(typecode).itemsize
+        view = self._buffer[offset:offset + length * itemsize].cast(typecode)
+        self._views.append(view)
+        return view
+
+    def _string(self, offsets, index):
+        return str(self._strings[offsets[index]:offsets[index + 1]], "utf-8")
+
+    def _is_null(self, index, column):
+        return bool(self._nulls[index] & (1 << STRING_COLUMNS.index(column)))
+
+    def _value(self, offsets, index, column):
+        #like _string() but returns None for values that were NULL in the database
+        return None if self._is_null(index, column) else self._string(offsets, index)
+
+    def _periodicity(self, code):
+        return self._string(self._periodicity_offsets, code)
+
+    def _find(self, name):
+        """Binary search over the sorted name column. Returns the index of the habit or -1."""
+        key = name.encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            probe = self._strings[self._names[middle]:self._names[middle + 1]].tobytes()
+            if probe < key:
+                low = middle + 1
+            elif probe > key:
+                high = middle
+            else:
+                return middle
+        return -1
+
+    def get_all_habits(self):
+        """
+        Equivalent of analytics.get_all_habits() served from the snapshot.
+
+        :return: A list of dictionaries with the same keys as analytics.get_all_habits().
+        """
+        return [
+            {
+                "name": self._value(self._names, i, "name"),
+                "description": self._value(self._descriptions, i, "description"),
+                "periodicity": None if self._is_null(i, "periodicity") else self._periodicity(self._codes[i]),
+                "created_at": self._value(self._created, i, "created_at"),
+                "current_streak": self._current[i],
+                "last_increment_date": self._value(self._last, i, "last_increment_date")
+            }
+            for i in range(self.count)
+        ]
+
+    def get_habits_by_periodicity(self, periodicity):
+        """
+        Equivalent of analytics.get_habits_by_periodicity() served from the snapshot.
+        Only the two byte wide code column is scanned; names are decoded for matching habits only.
+
+        :param periodicity: The periodicity to filter habits by (e.g., "daily", "weekly").
+        :return: A list of habit names with the specified periodicity.
+        """
+        wanted = {
+            code for code in range(len(self._periodicity_offsets) - 1)
+            if (self._periodicity(code) or "").lower() == periodicity.lower()
+        }
+        return [self._string(self._names, i) for i in range(self.count) if self._codes[i] in wanted]
+
+    def calculate_longest_streak(self, habit_name):
+        """
+        Equivalent of analytics.calculate_longest_streak() served from the snapshot.
+
+        :param habit_name: The name of the habit.
+        :return: The longest streak, or None if the habit does not exist or was never incremented.
+        """
+        index = self._find(habit_name)
+        if index < 0 or self._longest[index] == NO_STREAK:
+            return None
+        return self._longest[index]
+
+    def get_completion_count(self, habit_name):
+        """
+        Returns the number of recorded increments for a habit.
+
+        :param habit_name: The name of the habit.
+        :return: The number of increments, or None if the habit does not exist.
+        """
+        index = self._find(habit_name)
+        return self._completions[index] if index >= 0 else None
+
+    def close(self):
+        """
+        Releases all views and unmaps the file.
+        """
+        for view in getattr(self, "_views", []):
+            view.release()
+        self._views = []
+        self._buffer.release()
+        self._mmap.close()
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
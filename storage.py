@@ -0,0 +1,380 @@
+"""
+The storage module defines the interface the habit class and the analytics module use to access habit data,
+together with two implementations:
+
+SQLiteStorage: Wraps a database connection and the functions of the db module.
+MemoryStorage: Keeps all data in dictionaries and sorted arrays. It is meant for short-lived use and tests and can
+               optionally persist its changes to an SQLite database in the background (write-behind).
+
+Functions that accept a "db" parameter accept either a database connection or a storage object, see as_storage().
+"""
+
+import logging
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from typing import Protocol
+from db import get_db, add_habit, increment_habit, load_habit, delete_habit, set_durability, flush, TREND_COLUMNS
+from durability import GROUP
+from history import period_index
+from trends import update_trend, from_row
+
+logger = logging.getLogger(__name__)
+
+
+class HabitStorage(Protocol):
+    """
+    Operations every storage backend provides. Habits are identified by their name.
+    """
+    def add_habit(self, name, description, periodicity, created_at, last_increment_date=None): ...
+
+    def increment_habit(self, name, event_timestamp, streak): ...
+
+    def load_habit(self, name): ...
+
+    def delete_habit(self, name): ...
+
+    def scan(self): ...
+
+    def scan_page(self, after=None, limit=50, periodicity=None): ...
+
+    def habits_by_periodicity(self, periodicity): ...
+
+    def longest_streak(self, name): ...
+
+    def longest_streak_all(self): ...
+
+    def trend_state(self, name): ...
+
+    def trend_states(self): ...
+
+
+def as_storage(db):
+    """
+    Returns a storage object for the given database connection or storage object.
+
+    :param db: A database connection object or an object implementing HabitStorage.
+    :return: An object implementing HabitStorage.
+    """
+    if isinstance(db, sqlite3.Connection):
+        return SQLiteStorage(db)
+    return db
+
+
+class SQLiteStorage:
+    def __init__(self, db):
+        """
+        Storage backend for an SQLite database.
+
+        :param db: The database connection object.
+        """
+        self.db = db
+
+    def add_habit(self, name, description, periodicity, created_at, last_increment_date=None):
+        add_habit(self.db, name, description, periodicity, created_at, last_increment_date)
+
+    def increment_habit(self, name, event_timestamp, streak):
+        increment_habit(self.db, name, event_timestamp, streak)
+
+    def load_habit(self, name):
+        return load_habit(self.db, name)
+
+    def delete_habit(self, name):
+        delete_habit(self.db, name)
+
+    def scan(self):
+        cur = self.db.cursor()
+        cur.execute("SELECT name, description, periodicity, created_at, current_streak, last_increment_date FROM habits")
+        results = cur.fetchall()
+        return [
+            {
+                "name": row[0],
+                "description": row[1],
+                "periodicity": row[2],
+                "created_at": row[3],
+                "current_streak": row[4],
+                "last_increment_date": row[5]
+            }
+            for row in results
+        ]
+
+    def scan_page(self, after=None, limit=50, periodicity=None):
+        cur = self.db.cursor()
+        #keyset pagination over the unique index on name (or idx_habits_periodicity), every page costs the same no
+        #matter how far the user scrolled
+        columns = "name, description, periodicity, created_at, current_streak, last_increment_date"
+        after = after if after is not None else ""
+        if periodicity is None:
+            cur.execute(f"SELECT {columns} FROM habits WHERE name > ? ORDER BY name LIMIT ?", (after, limit))
+        else:
+            cur.execute(f"""SELECT {columns} FROM habits WHERE LOWER(periodicity) = ? AND name > ?
+                ORDER BY name LIMIT ?""", (periodicity.lower(), after, limit))
+        return [
+            {
+                "name": row[0],
+                "description": row[1],
+                "periodicity": row[2],
+                "created_at": row[3],
+                "current_streak": row[4],
+                "last_increment_date": row[5]
+            }
+            for row in cur.fetchall()
+        ]
+
+    def habits_by_periodicity(self, periodicity):
+        cur = self.db.cursor()
+        cur.execute("SELECT name FROM habits WHERE LOWER(periodicity) = ? ORDER BY habit_id", (periodicity.lower(),)) #in insertion order, not in the order of idx_habits_periodicity
+        results = cur.fetchall()
+        return [row[0] for row in results]
+
+    def longest_streak(self, name):
+        cur = self.db.cursor()
+        cur.execute("SELECT MAX(streak) FROM increments WHERE habit_id = (SELECT habit_id FROM habits WHERE name = ?)", (name,))
+        result = cur.fetchone()
+        return result[0] if result else 0
+
+    def longest_streak_all(self):
+        cur = self.db.cursor()
+        #using WHERE and returning a list of habits allows to handle the case where there is not only one habit with the highest habit streak
+        cur.execute("""
+            SELECT h.name, i.streak
+            FROM increments i
+            JOIN habits h ON h.habit_id = i.habit_id
+            WHERE i.streak = (SELECT MAX(i.streak) FROM increments i JOIN habits h ON h.habit_id = i.habit_id)
+        """) #the join skips increments of soft-deleted habits that were not purged yet
+        return [{"habit": row[0], "longest_streak": row[1]} for row in cur.fetchall()]
+
+    def trend_state(self, name):
+        cur = self.db.cursor()
+        cur.execute(f"SELECT name, periodicity, created_at, {', '.join(TREND_COLUMNS)} FROM habits WHERE name = ?", (name,))
+        row = cur.fetchone()
+        if not row:
+            raise ValueError(f"Habit '{name}' does not exist.")
+        return {"name": row[0], "periodicity": row[1], "created_at": row[2], "trend": from_row(*row[3:])}
+
+    def trend_states(self):
+        cur = self.db.cursor()
+        cur.execute(f"SELECT name, periodicity, created_at, {', '.join(TREND_COLUMNS)} FROM habits")
+        return [
+            {"name": row[0], "periodicity": row[1], "created_at": row[2], "trend": from_row(*row[3:])}
+            for row in cur.fetchall()
+        ]
+
+
+class MemoryStorage:
+    def __init__(self, persist_to=None, interval=1.0):
+        """
+        Storage backend that keeps all habits in memory.
+
+        Habits are stored in a dictionary in insertion order, an index maps each periodicity to its habits and the
+        streaks of every habit are kept in a sorted array, so the longest streak is its last element.
+
+        :param persist_to: Optional name of an SQLite database. Its habits are loaded on creation and all later
+                           changes are written to it by a background thread (write-behind).
+        :param interval: Seconds between two writes to the database in write-behind mode.
+        """
+        self._habits = {}
+        self._names = [] #sorted, for paging
+        self._by_periodicity = {}
+        self._names_by_periodicity = {} #sorted per periodicity, for paging
+        self._streaks = {}
+        self._increments = {}
+        self._trends = {}
+        self._lock = threading.RLock()
+
+        self.persist_to = persist_to
+        self.interval = interval
+        self._pending = []
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        if persist_to:
+            self._load(persist_to)
+            self._thread = threading.Thread(target=self._write_behind, daemon=True)
+            self._thread.start()
+
+    def _load(self, name):
+        db = get_db(name)
+        try:
+            for habit in SQLiteStorage(db).scan():
+                self._insert(habit)
+            cur = db.execute("""SELECT h.name, i.incremented_at, i.streak FROM increments i
+                JOIN habits h ON h.habit_id = i.habit_id ORDER BY i.rowid""")
+            for name, incremented_at, streak in cur:
+                self._record_increment(name, incremented_at, streak)
+        finally:
+            db.close()
+
+    def _insert(self, habit):
+        self._habits[habit["name"]] = habit
+        insort(self._names, habit["name"])
+        self._by_periodicity.setdefault((habit["periodicity"] or "").lower(), {})[habit["name"]] = None
+        insort(self._names_by_periodicity.setdefault((habit["periodicity"] or "").lower(), []), habit["name"])
+        self._streaks[habit["name"]] = array("i")
+        self._increments[habit["name"]] = []
+        self._trends[habit["name"]] = None
+
+    def _record_increment(self, name, event_timestamp, streak):
+        habit = self._habits[name]
+        self._increments[name].append((event_timestamp, streak))
+        insort(self._streaks[name], streak)
+        period = period_index(habit["periodicity"], habit["created_at"], event_timestamp)
+        self._trends[name] = update_trend(self._trends[name], period)
+
+    def add_habit(self, name, description, periodicity, created_at, last_increment_date=None):
+        with self._lock:
+            if name in self._habits:
+                raise ValueError(f"Habit '{name}' already exists.")
+            self._insert({
+                "name": name,
+                "description": description,
+                "periodicity": periodicity,
+                "created_at": created_at,
+                "current_streak": 0,
+                "last_increment_date": last_increment_date
+            })
+            self._queue(add_habit, name, description, periodicity, created_at, last_increment_date)
+
+    def increment_habit(self, name, event_timestamp, streak):
+        with self._lock:
+            habit = self._habits.get(name)
+            if habit is None:
+                raise ValueError(f"Habit '{name}' does not exist.")
+            habit["current_streak"] = streak
+            habit["last_increment_date"] = event_timestamp
+            self._record_increment(name, event_timestamp, streak)
+            self._queue(increment_habit, name, event_timestamp, streak)
+
+    def load_habit(self, name):
+        with self._lock:
+            habit = self._habits.get(name)
+            if habit is None:
+                raise ValueError(f"Habit '{name}' does not exist.")
+            return {key: habit[key] for key in ("name", "description", "periodicity", "current_streak", "last_increment_date")}
+
+    def delete_habit(self, name):
+        with self._lock:
+            habit = self._habits.pop(name, None)
+            if habit is None:
+                return
+            del self._names[bisect_left(self._names, name)]
+            del self._by_periodicity[(habit["periodicity"] or "").lower()][name]
+            names = self._names_by_periodicity[(habit["periodicity"] or "").lower()]
+            del names[bisect_left(names, name)]
+            del self._streaks[name]
+            del self._increments[name]
+            del self._trends[name]
+            self._queue(delete_habit, name)
+
+    def scan(self):
+        with self._lock:
+            return [dict(habit) for habit in self._habits.values()]
+
+    def scan_page(self, after=None, limit=50, periodicity=None):
+        with self._lock:
+            names = self._names if periodicity is None else self._names_by_periodicity.get(periodicity.lower(), [])
+            start = bisect_right(names, after) if after is not None else 0
+            return [dict(self._habits[name]) for name in names[start:start + limit]]
+
+    def habits_by_periodicity(self, periodicity):
+        with self._lock:
+            return list(self._by_periodicity.get(periodicity.lower(), {}))
+
+    def longest_streak(self, name):
+        with self._lock:
+            streaks = self._streaks.get(name)
+            return streaks[-1] if streaks else None
+
+    def longest_streak_all(self):
+        with self._lock:
+            longest = max((streaks[-1] for streaks in self._streaks.values() if streaks), default=None)
+            if longest is None:
+                return []
+            #one entry per increment with the longest streak, like the SQL query of SQLiteStorage
+            return [
+                {"habit": name, "longest_streak": longest}
+                for name, streaks in self._streaks.items() if streaks and streaks[-1] == longest
+                for _ in range(len(streaks) - bisect_left(streaks, longest))
+            ]
+
+    def trend_state(self, name):
+        with self._lock:
+            habit = self._habits.get(name)
+            if habit is None:
+                raise ValueError(f"Habit '{name}' does not exist.")
+            return {"name": name, "periodicity": habit["periodicity"], "created_at": habit["created_at"], "trend": self._trends[name]}
+
+    def trend_states(self):
+        with self._lock:
+            return [
+                {"name": name, "periodicity": habit["periodicity"], "created_at": habit["created_at"], "trend": self._trends[name]}
+                for name, habit in self._habits.items()
+            ]
+
+    def _queue(self, function, *args):
+        if self.persist_to:
+            self._pending.append((function, args))
+
+    def flush(self):
+        """
+        Writes all pending changes to the database in a single transaction. Does nothing without write-behind.
+        Every change is applied under its own savepoint. A change that can never be written, e.g. adding a habit
+        whose name was taken by another process in the meantime, is logged and dropped. On any other error nothing
+        is written and all changes stay queued for the next flush.
+
+        :raises Exception: The error that stopped the batch from being written.
+        """
+        if not self.persist_to:
+            return
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            try:
+                db = get_db(self.persist_to)
+            except Exception:
+                self._requeue(pending)
+                raise
+            try:
+                #group mode without limits keeps the db functions from committing each change on their own
+                set_durability(db, GROUP, window=float("inf"), max_pending=float("inf"))
+                db.execute("BEGIN") #savepoints nest inside it, releasing them does not commit
+                for function, args in pending:
+                    db.execute("SAVEPOINT change")
+                    try:
+                        function(db, *args)
+                    except (sqlite3.IntegrityError, ValueError):
+                        db.execute("ROLLBACK TO change")
+                        logger.exception("Dropping change %s%r that cannot be written to '%s'.", function.__name__, args, self.persist_to)
+                    db.execute("RELEASE change")
+                flush(db)
+            except Exception:
+                db.rollback()
+                self._requeue(pending)
+                raise
+            finally:
+                db.durability = None
+                db.close()
+
+    def _requeue(self, pending):
+        with self._lock:
+            self._pending[:0] = pending #in front of the changes queued in the meantime, keeps their order
+
+    def _write_behind(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writing pending changes to '%s' failed, retrying in %s seconds.", self.persist_to, self.interval)
+
+    def close(self):
+        """
+        Stops the write-behind thread and writes the remaining changes to the database.
+        """
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
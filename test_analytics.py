@@ -2,7 +2,10 @@
 This module groups all the unit tests for the analytics module.
 """
 
-from analytics import get_all_habits, get_habits_by_periodicity, calculate_longest_streak, calculate_longest_streak_all
+from datetime import datetime
+from analytics import get_all_habits, get_habits_by_periodicity, calculate_longest_streak, calculate_longest_streak_all, \
+    get_habit_trends, get_most_struggling_habits, get_habits_page
+from db import increment_habit
 import pytest
 
 def test_get_all_habits(test_db):
@@ -55,4 +58,44 @@ def test_calculate_longest_streak_all(test_db):
 
     # Verify the habit details
     expected_result = {"habit": "Review Finances", "longest_streak": 3}
-    assert result[0] == expected_result  # Verify the result matches the expected output
\ No newline at end of file
+    assert result[0] == expected_result  # Verify the result matches the expected output
+
+def test_get_habit_trends(test_db):
+    #"Read a Book" was completed on 2024-01-01 and 2024-01-02
+    trends = get_habit_trends(test_db, "Read a Book", now=datetime(2024, 1, 3))
+    assert trends["completion_rate_7d"] == pytest.approx(2 / 3)
+    assert trends["consistency"] == pytest.approx(0.19)
+    assert trends["breaks"] == 0
+
+    #two days without completion break the streak and lower the consistency
+    trends = get_habit_trends(test_db, "Read a Book", now=datetime(2024, 1, 5))
+    assert trends["consistency"] == pytest.approx(0.19 * 0.9 ** 2)
+    assert trends["breaks"] == 1
+    assert trends["break_frequency"] == pytest.approx(1 / 5)
+
+    with pytest.raises(ValueError):
+        get_habit_trends(test_db, "Does not exist")
+
+
+def test_get_habit_trends_after_increment(test_db):
+    increment_habit(test_db, "Read a Book", "2024-01-03 07:00:00", 3)
+    trends = get_habit_trends(test_db, "Read a Book", now=datetime(2024, 1, 3))
+    assert trends["completion_rate_7d"] == 1.0
+    assert trends["consistency"] == pytest.approx(0.271)
+
+
+def test_get_most_struggling_habits(test_db):
+    ranking = get_most_struggling_habits(test_db, limit=3, now=datetime(2024, 1, 16))
+    assert [habit["habit"] for habit in ranking] == ["Water the Plants", "Morning Jog", "Read a Book"]
+
+
+def test_get_habits_page(test_db):
+    first = get_habits_page(test_db, limit=2)
+    assert [habit["name"] for habit in first] == ["Call Parents", "Morning Jog"]
+
+    second = get_habits_page(test_db, after=first[-1]["name"], limit=2)
+    assert [habit["name"] for habit in second] == ["Read a Book", "Review Finances"]
+
+    last = get_habits_page(test_db, after=second[-1]["name"], limit=2)
+    assert [habit["name"] for habit in last] == ["Water the Plants"]
+    assert get_habits_page(test_db, after="Water the Plants") == []
@@ -0,0 +1,131 @@
+"""
+This module groups all the unit tests for the archive module.
+"""
+
+import sqlite3
+from datetime import datetime
+import archive
+from archive import soft_delete_habits, purge_deleted_habits, PurgeWorker
+from analytics import get_all_habits, calculate_longest_streak_all
+from db import get_db, add_habit, increment_habit, set_durability
+import pytest
+
+
+def test_soft_delete_by_name(test_db):
+    deleted = soft_delete_habits(test_db, names=["Read a Book", "Call Parents", "Does not exist"])
+    assert sorted(deleted) == ["Call Parents", "Read a Book"]
+
+    names = [habit["name"] for habit in get_all_habits(test_db)]
+    assert "Read a Book" not in names
+    assert len(names) == 3
+
+    #the name can be reused right away
+    add_habit(test_db, "Read a Book", "Read 20 pages", "Daily", "2024-02-01 09:00:00")
+
+
+def test_soft_delete_inactive(test_db):
+    #"Water the Plants" was never incremented and was created before 2024-01-03, the other two were last incremented before it
+    deleted = soft_delete_habits(test_db, inactive_since=datetime(2024, 1, 3))
+    assert sorted(deleted) == ["Morning Jog", "Read a Book", "Water the Plants"]
+
+
+def test_longest_streak_ignores_soft_deleted(test_db):
+    #"Review Finances" holds the longest streak, its increments stay in place until they are purged
+    soft_delete_habits(test_db, names=["Review Finances"])
+    assert calculate_longest_streak_all(test_db) == [{"habit": "Read a Book", "longest_streak": 2}]
+
+
+def test_soft_delete_requires_selection(test_db):
+    with pytest.raises(ValueError):
+        soft_delete_habits(test_db)
+
+
+def test_purge_deleted_habits(test_db):
+    soft_delete_habits(test_db, names=["Review Finances"])
+    #increments stay in place until they are purged
+    assert test_db.execute("SELECT COUNT(*) FROM increments").fetchone()[0] == 7
+
+    assert purge_deleted_habits(test_db, batch_size=2) == 3
+    assert test_db.execute("SELECT COUNT(*) FROM increments").fetchone()[0] == 4
+    assert test_db.execute("SELECT COUNT(*) FROM deleted_habits").fetchone()[0] == 0
+
+
+def test_purge_into_archive(test_db, tmp_path):
+    archive_path = str(tmp_path / "archive.db")
+    soft_delete_habits(test_db, names=["Review Finances", "Water the Plants"])
+    purge_deleted_habits(test_db, archive_path=archive_path)
+
+    archive = sqlite3.connect(archive_path)
+    names = sorted(row[0] for row in archive.execute("SELECT name FROM habits"))
+    assert names == ["Review Finances", "Water the Plants"]
+    assert archive.execute("SELECT MAX(streak) FROM increments").fetchone()[0] == 3
+    archive.close()
+
+
+def test_purge_worker(tmp_path):
+    path = str(tmp_path / "habits.db")
+    db = get_db(path)
+    for i in range(20):
+        add_habit(db, f"Habit {i}", "", "Daily", "2024-01-01 09:00:00")
+        for day in range(1, 10):
+            increment_habit(db, f"Habit {i}", f"2024-01-{day:02d} 09:00:00", day)
+    soft_delete_habits(db, names=[f"Habit {i}" for i in range(10)])
+
+    worker = PurgeWorker(path, batch_size=5, interval=0.01, pause=0)
+    worker.start()
+    for _ in range(500):
+        if db.execute("SELECT COUNT(*) FROM deleted_habits").fetchone()[0] == 0:
+            break
+        worker.join(0.01)
+    worker.stop()
+
+    assert worker.purged == 90
+    assert db.execute("SELECT COUNT(*) FROM increments").fetchone()[0] == 90
+    db.close()
+
+
+def test_purge_worker_survives_errors(tmp_path, monkeypatch, caplog):
+    path = str(tmp_path / "habits.db")
+    get_db(path).close()
+    calls = []
+
+    def purge(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return 0
+
+    monkeypatch.setattr(archive, "purge_deleted_habits", purge)
+    worker = PurgeWorker(path, interval=0.01)
+    worker.start()
+    for _ in range(500):
+        if len(calls) > 1:
+            break
+        worker.join(0.01)
+    assert worker.is_alive()
+    worker.stop()
+    assert len(calls) > 1
+    assert "database is locked" in caplog.text
+
+
+def test_archive_keeps_group_commits(tmp_path):
+    path = str(tmp_path / "habits.db")
+    db = get_db(path)
+    set_durability(db, "group", max_pending=100, window=60)
+    add_habit(db, "Yoga", "", "Daily", "2024-01-01 09:00:00")
+    increment_habit(db, "Yoga", "2024-01-01 09:00:00", 1)
+
+    #nothing to purge, the rollback at the end must not discard the acknowledged writes
+    purge_deleted_habits(db, archive_path=str(tmp_path / "archive.db"))
+    add_habit(db, "Swim", "", "Daily", "2024-01-01 09:00:00")
+    soft_delete_habits(db, names=["Does not exist"])
+    add_habit(db, "Read", "", "Daily", "2024-01-01 09:00:00")
+    assert db.durability.pending == 1
+    soft_delete_habits(db, names=["Read"])
+    assert db.durability.pending == 0
+
+    other = get_db(path)
+    assert [habit["name"] for habit in get_all_habits(other)] == ["Yoga", "Swim"]
+    assert other.execute("SELECT COUNT(*) FROM increments").fetchone()[0] == 1
+    other.close()
+    db.close()
@@ -0,0 +1,66 @@
+"""
+This module groups all the unit tests for the background module.
+"""
+
+import io
+import threading
+from concurrent.futures import Future
+from background import BackgroundDB, HabitPager, wait_for
+from db import get_db, add_habit
+import pytest
+
+
+@pytest.fixture
+def background(tmp_path):
+    path = str(tmp_path / "habits.db")
+    db = get_db(path)
+    for i in range(45):
+        add_habit(db, f"Habit {i:02d}", "", "Daily" if i % 3 else "Weekly", "2024-01-01 09:00:00")
+    db.close()
+
+    background = BackgroundDB(path)
+    yield background
+    background.close()
+
+
+def test_background_runs_on_worker_thread(background):
+    thread = background.run(lambda db: threading.current_thread())
+    assert thread is not threading.current_thread()
+    assert background.run(lambda db, name: db.execute("SELECT COUNT(*) FROM habits WHERE name = ?", (name,)).fetchone()[0], "Habit 00") == 1
+
+
+def test_habit_pager(background):
+    pager = HabitPager(background, page_size=20)
+    pages = []
+    while pager.has_more:
+        pages.append([habit["name"] for habit in pager.next_page()])
+
+    assert [len(page) for page in pages] == [20, 20, 5]
+    assert pages[1][0] == "Habit 20"
+    assert pager.next_page() == []
+
+
+def test_habit_pager_by_periodicity(background):
+    pager = HabitPager(background, page_size=10, periodicity="weekly")
+    names = []
+    while pager.has_more:
+        names += [habit["name"] for habit in pager.next_page()]
+    assert names == [f"Habit {i:02d}" for i in range(0, 45, 3)]
+
+
+def test_wait_for_shows_spinner():
+    future = Future()
+    threading.Timer(0.05, future.set_result, ("done",)).start()
+    stream = io.StringIO()
+    assert wait_for(future, "Loading", stream=stream, interval=0.01) == "done"
+    assert "Loading" in stream.getvalue()
+    #the spinner line is cleared again
+    assert stream.getvalue().endswith("\r")
+
+
+def test_wait_for_fast_result():
+    future = Future()
+    future.set_result(1)
+    stream = io.StringIO()
+    assert wait_for(future, "Loading", stream=stream) == 1
+    assert stream.getvalue() == ""
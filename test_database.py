@@ -0,0 +1,122 @@
+"""
+This module groups the unit tests for the db module that are not covered through the habit and analytics tests.
+"""
+
+import sqlite3
+from db import get_db, get_habit_id, add_habit, increment_habit, delete_habit, search_habits, habit_exists
+from analytics import calculate_longest_streak
+import pytest
+
+
+def test_habit_id_is_cached(test_db):
+    habit_id = get_habit_id(test_db, "Read a Book")
+    assert test_db.habit_ids["Read a Book"] == habit_id
+
+    delete_habit(test_db, "Read a Book")
+    assert "Read a Book" not in test_db.habit_ids
+    with pytest.raises(ValueError):
+        get_habit_id(test_db, "Read a Book")
+
+
+def test_increment_unknown_habit(test_db):
+    with pytest.raises(ValueError):
+        increment_habit(test_db, "Does not exist", "2024-01-01 09:00:00", 1)
+
+
+def test_increment_habit_deleted_by_other_connection(tmp_path):
+    path = str(tmp_path / "habits.db")
+    db = get_db(path)
+    other = get_db(path)
+    db.execute("INSERT INTO habits (name, description, periodicity, created_at, current_streak) VALUES ('Yoga', '', 'Daily', '2024-01-01 09:00:00', 0)")
+    db.commit()
+    get_habit_id(db, "Yoga")
+
+    delete_habit(other, "Yoga")
+
+    #the stale cache entry is dropped instead of writing an orphaned increment
+    with pytest.raises(ValueError):
+        increment_habit(db, "Yoga", "2024-01-02 09:00:00", 1)
+    assert "Yoga" not in db.habit_ids
+    assert db.execute("SELECT COUNT(*) FROM increments").fetchone()[0] == 0
+    db.close()
+    other.close()
+
+
+def test_stale_habit_id_is_looked_up_again(tmp_path):
+    path = str(tmp_path / "habits.db")
+    db = get_db(path)
+    other = get_db(path)
+    add_habit(db, "Run", "", "Daily", "2024-01-01 09:00:00")
+
+    #the other connection re-adds the habit, which gives it a new habit_id
+    delete_habit(other, "Run")
+    add_habit(other, "Run", "", "Daily", "2024-01-01 09:00:00")
+
+    increment_habit(db, "Run", "2024-01-02 09:00:00", 1)
+    assert db.habit_ids["Run"] == get_habit_id(other, "Run")
+    assert calculate_longest_streak(other, "Run") == 1
+
+    delete_habit(other, "Run")
+    add_habit(other, "Run", "", "Daily", "2024-01-01 09:00:00")
+    delete_habit(db, "Run")
+    assert db.execute("SELECT COUNT(*) FROM habits").fetchone()[0] == 0
+    db.close()
+    other.close()
+
+
+def test_migrate_name_keyed_database(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    legacy = sqlite3.connect(path)
+    legacy.execute("""CREATE TABLE habits (name TEXT PRIMARY KEY, description TEXT, periodicity TEXT, created_at TEXT,
+        current_streak INT, last_increment_date TEXT)""")
+    legacy.execute("""CREATE TABLE increments (incremented_at TEXT, habitName TEXT, streak INTEGER,
+        FOREIGN KEY (habitName) REFERENCES habit(name))""")
+    legacy.execute("INSERT INTO habits VALUES ('Morning Jog', 'Run', 'Daily', '2024-01-01 09:00:00', 2, '2024-01-02 09:00:00')")
+    legacy.execute("INSERT INTO increments VALUES ('2024-01-01 09:00:00', 'Morning Jog', 1)")
+    legacy.execute("INSERT INTO increments VALUES ('2024-01-02 09:00:00', 'Morning Jog', 2)")
+    legacy.execute("INSERT INTO increments VALUES ('2024-01-02 09:00:00', 'Deleted Habit', 5)")
+    legacy.commit()
+    legacy.close()
+
+    db = get_db(path)
+    assert "habit_id" in [row[1] for row in db.execute("PRAGMA table_info(habits)")]
+    assert "habitName" not in [row[1] for row in db.execute("PRAGMA table_info(increments)")]
+    assert calculate_longest_streak(db, "Morning Jog") == 2
+    #increments without a habit are dropped during the migration
+    assert db.execute("SELECT COUNT(*) FROM increments").fetchone()[0] == 2
+    #migrated databases use incremental vacuum like new ones, see archive.purge_deleted_habits()
+    assert db.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    db.close()
+
+
+def test_search_habits_prefix(test_db):
+    assert search_habits(test_db, "Rea") == ["Read a Book"]
+    assert search_habits(test_db, "mor jo") == ["Morning Jog"]
+    #"weekly" only appears in descriptions
+    assert sorted(search_habits(test_db, "weekly")) == ["Call Parents", "Review Finances", "Water the Plants"]
+
+
+def test_search_habits_ranks_names_first(test_db):
+    add_habit(test_db, "Pages", "Read a few pages", "Daily", "2024-01-01 09:00:00")
+    assert search_habits(test_db, "read") == ["Read a Book", "Pages"]
+
+
+def test_search_habits_with_typo(test_db):
+    assert search_habits(test_db, "Parnets") == ["Call Parents"]
+
+
+def test_search_index_follows_changes(test_db):
+    add_habit(test_db, "Evening Walk", "Walk for 15 minutes", "Daily", "2024-01-01 09:00:00")
+    assert search_habits(test_db, "walk") == ["Evening Walk"]
+
+    delete_habit(test_db, "Evening Walk")
+    assert search_habits(test_db, "walk") == []
+    assert search_habits(test_db, "") == []
+
+
+def test_habit_exists(test_db):
+    add_habit(test_db, "🏃", "", "Daily", "2024-01-01 09:00:00")
+    assert search_habits(test_db, "🏃") == []
+    assert habit_exists(test_db, "🏃")
+    assert habit_exists(test_db, "Read a Book")
+    assert not habit_exists(test_db, "Read a")
@@ -0,0 +1,148 @@
+"""
+This module groups the unit tests for the durability levels of the db module.
+The fault injection tests run the writer in a child process, kill it while it is writing and check which
+acknowledged increments survived.
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+from db import get_db, add_habit, increment_habit, delete_habit, set_durability, flush
+import pytest
+
+pytestmark = pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="requires SIGKILL")
+
+MAX_PENDING = 50
+
+#prints the streak of every increment after increment_habit() returned, i.e. after it was acknowledged
+WRITER = """
+import os, signal, sys
+sys.path.insert(0, {root!r})
+from db import get_db, add_habit, increment_habit, set_durability
+
+path, level, journal, fault = sys.argv[1:5]
+db = get_db(path)
+set_durability(db, level, journal_path=journal or None, max_pending={max_pending}, window=60, fsync_batch=20)
+add_habit(db, "Yoga", "", "Daily", "2024-01-01 09:00:00")
+streak = 0
+while True:
+    streak += 1
+    if fault == "torn" and streak == 100: #dies in the middle of writing the journal record
+        write = db.durability.journal.write
+        def torn_write(text):
+            write(text[:len(text) // 2])
+            db.durability.journal.flush()
+            os.kill(os.getpid(), signal.SIGKILL)
+        db.durability.journal.write = torn_write
+    increment_habit(db, "Yoga", "2024-01-01 09:00:00", streak)
+    print(streak, flush=True)
+"""
+
+
+def run_writer(tmp_path, level, fault="none", acks=300):
+    path = str(tmp_path / "habits.db")
+    journal = str(tmp_path / "habits.journal") if level == "buffered" else ""
+    script = WRITER.format(root=os.path.dirname(os.path.abspath(__file__)), max_pending=MAX_PENDING)
+    process = subprocess.Popen([sys.executable, "-c", script, path, level, journal, fault], stdout=subprocess.PIPE, text=True)
+
+    acknowledged = 0
+    for line in process.stdout:
+        acknowledged = int(line)
+        if acknowledged >= acks:
+            process.kill()
+            break
+    acknowledged = max([acknowledged] + [int(line) for line in process.stdout.read().split()])
+    process.wait()
+    assert process.returncode == -signal.SIGKILL
+
+    db = get_db(path)
+    if journal:
+        set_durability(db, "buffered", journal_path=journal) #replays the journal
+    stored = db.execute("SELECT COUNT(*) FROM increments").fetchone()[0]
+    db.close()
+    return acknowledged, stored
+
+
+def test_strict_loses_nothing(tmp_path):
+    acknowledged, stored = run_writer(tmp_path, "strict")
+    assert acknowledged <= stored <= acknowledged + 1
+
+
+def test_group_loses_less_than_one_group(tmp_path):
+    acknowledged, stored = run_writer(tmp_path, "group")
+    assert acknowledged - MAX_PENDING < stored <= acknowledged + 1
+
+
+def test_buffered_replays_journal(tmp_path):
+    acknowledged, stored = run_writer(tmp_path, "buffered")
+    assert acknowledged <= stored <= acknowledged + 1
+
+
+def test_buffered_skips_torn_record(tmp_path):
+    acknowledged, stored = run_writer(tmp_path, "buffered", fault="torn")
+    assert acknowledged == stored == 99
+
+
+def test_group_commit_on_flush(tmp_path):
+    path = str(tmp_path / "habits.db")
+    db = get_db(path)
+    set_durability(db, "group", max_pending=MAX_PENDING, window=60)
+    add_habit(db, "Yoga", "", "Daily", "2024-01-01 09:00:00")
+    increment_habit(db, "Yoga", "2024-01-01 09:00:00", 1)
+
+    other = get_db(path)
+    assert other.execute("SELECT COUNT(*) FROM habits").fetchone()[0] == 0
+    flush(db)
+    assert other.execute("SELECT COUNT(*) FROM increments").fetchone()[0] == 1
+    other.close()
+    db.close()
+
+
+def test_group_commit_after_window(tmp_path):
+    path = str(tmp_path / "habits.db")
+    db = get_db(path)
+    set_durability(db, "group", max_pending=MAX_PENDING, window=0.05)
+    add_habit(db, "Yoga", "", "Daily", "2024-01-01 09:00:00")
+
+    #no further write follows, the timer commits and releases the write lock
+    other = get_db(path)
+    for _ in range(100):
+        if other.execute("SELECT COUNT(*) FROM habits").fetchone()[0] == 1:
+            break
+        time.sleep(0.01)
+    assert other.execute("SELECT COUNT(*) FROM habits").fetchone()[0] == 1
+    assert db.durability.pending == 0
+    add_habit(other, "Swim", "", "Daily", "2024-01-01 09:00:00")
+    other.close()
+    db.close()
+
+
+def test_unknown_level(test_db):
+    with pytest.raises(ValueError):
+        set_durability(test_db, "eventually")
+    with pytest.raises(ValueError):
+        set_durability(test_db, "buffered")
+
+
+def test_buffered_replays_delete(tmp_path):
+    path = str(tmp_path / "habits.db")
+    journal = str(tmp_path / "habits.journal")
+    db = get_db(path)
+    set_durability(db, "buffered", journal_path=journal, max_pending=MAX_PENDING, window=60)
+    add_habit(db, "Yoga", "", "Daily", "2024-01-01 09:00:00")
+    flush(db)
+    delete_habit(db, "Yoga")
+
+    #simulates a crash: the open transaction is lost, the journal survives
+    db.rollback()
+    db.durability.close()
+    db.durability = None
+    db.close()
+
+    db = get_db(path)
+    assert db.execute("SELECT COUNT(*) FROM habits").fetchone()[0] == 1
+    assert set_durability(db, "buffered", journal_path=journal) == 1
+    assert db.execute("SELECT COUNT(*) FROM habits").fetchone()[0] == 0
+    db.close()
@@ -0,0 +1,63 @@
+"""
+This module groups all the unit tests for the history module.
+"""
+
+import sqlite3
+from datetime import datetime
+from db import get_db, add_habit, increment_habit
+from history import mark_completed, to_bits, longest_run, run_ending_at, period_index, get_history_stats
+import pytest
+
+
+def test_bit_operations():
+    history = b""
+    for index in (0, 1, 2, 5, 6, 9):
+        history = mark_completed(history, index)
+    bits = to_bits(history)
+    assert bits == 0b1001100111
+    assert longest_run(bits) == 3
+    assert run_ending_at(bits, 6) == 2
+    assert run_ending_at(bits, 7) == 0
+    assert run_ending_at(bits, 2) == 3
+
+
+def test_period_index():
+    assert period_index("Daily", "2024-01-01 09:00:00", "2024-01-03 07:00:00") == 2
+    assert period_index("Weekly", "2024-01-01 09:00:00", "2024-01-15 10:00:00") == 2
+    assert period_index("Weekly", "2024-01-01 09:00:00", "2024-01-14 10:00:00") == 1
+
+
+def test_history_stats(test_db):
+    stats = get_history_stats(test_db, "Review Finances", now=datetime(2024, 1, 16))
+    assert stats == {"completed_periods": 3, "longest_streak": 3, "current_streak": 3, "completion_rate": 1.0}
+
+    #"Read a Book" was completed on the first two of four days
+    stats = get_history_stats(test_db, "Read a Book", now=datetime(2024, 1, 4))
+    assert stats == {"completed_periods": 2, "longest_streak": 2, "current_streak": 0, "completion_rate": 0.5}
+
+    #the streak is still alive while the current period is not completed yet
+    assert get_history_stats(test_db, "Read a Book", now=datetime(2024, 1, 3))["current_streak"] == 2
+
+    assert get_history_stats(test_db, "Water the Plants", now=datetime(2024, 1, 3))["longest_streak"] == 0
+    with pytest.raises(ValueError):
+        get_history_stats(test_db, "Does not exist")
+
+
+def test_history_backfill(tmp_path):
+    path = str(tmp_path / "habits.db")
+    db = get_db(path)
+    add_habit(db, "Yoga", "", "Daily", "2024-01-01 09:00:00")
+    for day in (1, 2, 3, 5):
+        increment_habit(db, "Yoga", f"2024-01-{day:02d} 09:00:00", 1)
+    expected = get_history_stats(db, "Yoga", now=datetime(2024, 1, 6))
+    db.close()
+
+    #a database from before the history column was added
+    db = sqlite3.connect(path)
+    db.execute("ALTER TABLE habits DROP COLUMN history")
+    db.commit()
+    db.close()
+
+    db = get_db(path)
+    assert get_history_stats(db, "Yoga", now=datetime(2024, 1, 6)) == expected
+    db.close()
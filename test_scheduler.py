@@ -0,0 +1,88 @@
+"""
+This module groups all the unit tests for the scheduler module.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from db import get_db, add_habit, increment_habit, delete_habit
+from scheduler import ReminderScheduler, next_deadline
+import pytest
+
+
+@pytest.fixture
+def scheduler(test_db):
+    scheduler = ReminderScheduler()
+    scheduler.attach(test_db)
+    yield scheduler
+    scheduler.detach()
+
+
+def test_next_deadline():
+    assert next_deadline("Daily", "2024-01-02 07:00:00") == (datetime(2024, 1, 3), datetime(2024, 1, 4))
+    assert next_deadline("Weekly", datetime(2024, 1, 15, 10)) == (datetime(2024, 1, 22), datetime(2024, 1, 23))
+    assert next_deadline("Weekly", None) is None
+
+
+def test_due_within(scheduler):
+    #"Read a Book" was last incremented on 2024-01-02 and breaks at the end of 2024-01-03
+    assert scheduler.due_within(timedelta(hours=1), now=datetime(2024, 1, 3, 23, 30)) == [("Read a Book", datetime(2024, 1, 4))]
+    assert scheduler.due_within(timedelta(hours=1), now=datetime(2024, 1, 3, 12)) == []
+
+
+def test_overdue(scheduler):
+    overdue = scheduler.overdue(now=datetime(2024, 1, 12))
+    #"Water the Plants" was never incremented and "Review Finances" is due on 2024-01-22
+    assert [name for name, due_until in overdue] == ["Morning Jog", "Read a Book", "Call Parents"]
+
+
+def test_increment_updates_deadline(test_db, scheduler):
+    assert "Read a Book" in [name for name, due in scheduler.overdue(now=datetime(2024, 1, 5))]
+
+    increment_habit(test_db, "Read a Book", "2024-01-05 08:00:00", 1)
+    assert "Read a Book" not in [name for name, due in scheduler.overdue(now=datetime(2024, 1, 5))]
+    assert scheduler.due_within(timedelta(days=2), now=datetime(2024, 1, 5)) == [("Read a Book", datetime(2024, 1, 7))]
+
+    delete_habit(test_db, "Read a Book")
+    assert scheduler.due_within(timedelta(days=2), now=datetime(2024, 1, 5)) == []
+
+
+def test_increments_in_same_period(test_db, scheduler):
+    increment_habit(test_db, "Read a Book", "2024-01-05 08:00:00", 1)
+    increment_habit(test_db, "Read a Book", "2024-01-05 20:00:00", 1)
+    assert scheduler.due_within(timedelta(days=2), now=datetime(2024, 1, 5)) == [("Read a Book", datetime(2024, 1, 7))]
+
+    #a late increment of an earlier day moves the deadline back and forth
+    increment_habit(test_db, "Read a Book", "2024-01-04 08:00:00", 1)
+    increment_habit(test_db, "Read a Book", "2024-01-05 09:00:00", 1)
+    assert scheduler.due_within(timedelta(days=2), now=datetime(2024, 1, 5)) == [("Read a Book", datetime(2024, 1, 7))]
+
+
+def test_ignores_other_connections(scheduler):
+    other = get_db(":memory:")
+    add_habit(other, "Read a Book", "", "Daily", "2024-01-01 09:00:00")
+    increment_habit(other, "Read a Book", "2024-01-05 08:00:00", 1)
+    delete_habit(other, "Read a Book")
+    other.close()
+
+    assert scheduler.due_within(timedelta(hours=1), now=datetime(2024, 1, 3, 23, 30)) == [("Read a Book", datetime(2024, 1, 4))]
+
+
+def test_poll_emits_events_once(scheduler):
+    now = datetime(2024, 1, 3, 23, 30)
+    events = scheduler.poll(timedelta(hours=1), now=now)
+    assert ("due", "Read a Book", datetime(2024, 1, 4)) in events
+    assert ("overdue", "Morning Jog", datetime(2024, 1, 3)) in events
+    assert scheduler.poll(timedelta(hours=1), now=now) == []
+
+
+def test_run_on_asyncio_loop(scheduler):
+    events = []
+
+    async def collect():
+        task = asyncio.create_task(scheduler.run(lambda *event: events.append(event), interval=0.01))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(collect())
+    #all fixture deadlines are in the past
+    assert sorted(name for event, name, due in events) == ["Call Parents", "Morning Jog", "Read a Book", "Review Finances"]
@@ -0,0 +1,88 @@
+"""
+This module groups all the unit tests for the snapshot module.
+"""
+
+from analytics import get_all_habits, get_habits_by_periodicity, calculate_longest_streak
+from db import add_habit
+from snapshot import export_snapshot, HabitSnapshot, MAX_PERIODICITIES
+import pytest
+
+
+def test_export_snapshot(test_db, tmp_path):
+    path = tmp_path / "habits.snap"
+    assert export_snapshot(test_db, path) == 5
+    assert path.exists()
+
+
+def test_snapshot_matches_analytics(test_db, tmp_path):
+    path = tmp_path / "habits.snap"
+    export_snapshot(test_db, path)
+
+    with HabitSnapshot(path) as snapshot:
+        assert len(snapshot) == 5
+
+        #the snapshot is sorted by name, the database returns the habits in insertion order
+        key = lambda habit: habit["name"]
+        assert sorted(snapshot.get_all_habits(), key=key) == sorted(get_all_habits(test_db), key=key)
+
+        for periodicity in ("daily", "Weekly"):
+            assert sorted(snapshot.get_habits_by_periodicity(periodicity)) == sorted(get_habits_by_periodicity(test_db, periodicity))
+
+        for name in ("Morning Jog", "Read a Book", "Water the Plants", "Review Finances", "Call Parents"):
+            assert snapshot.calculate_longest_streak(name) == calculate_longest_streak(test_db, name)
+
+
+def test_snapshot_unknown_habit(test_db, tmp_path):
+    path = tmp_path / "habits.snap"
+    export_snapshot(test_db, path)
+
+    with HabitSnapshot(path) as snapshot:
+        assert snapshot.calculate_longest_streak("Does not exist") is None
+        assert snapshot.get_completion_count("Does not exist") is None
+        assert snapshot.get_completion_count("Review Finances") == 3
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_snapshot"
+    path.write_bytes(b"\0" * 128)
+
+    with pytest.raises(ValueError):
+        HabitSnapshot(path)
+
+
+def test_snapshot_keeps_null_and_empty_strings(test_db, tmp_path):
+    add_habit(test_db, "No Description", None, "Daily", "2024-01-01 09:00:00", "")
+    path = tmp_path / "habits.snap"
+    export_snapshot(test_db, path)
+
+    with HabitSnapshot(path) as snapshot:
+        habit = next(habit for habit in snapshot.get_all_habits() if habit["name"] == "No Description")
+        assert habit["description"] is None
+        assert habit["last_increment_date"] == ""
+        #habits without an increment keep their NULL last_increment_date
+        plants = next(habit for habit in snapshot.get_all_habits() if habit["name"] == "Water the Plants")
+        assert plants["last_increment_date"] is None
+
+
+def test_snapshot_rejects_short_files(tmp_path):
+    path = tmp_path / "short"
+    path.write_bytes(b"HTSNAP")
+
+    with pytest.raises(ValueError):
+        HabitSnapshot(path)
+
+
+def test_snapshot_many_periodicities(test_db, tmp_path):
+    for i in range(300):
+        add_habit(test_db, f"Habit {i}", "", f"Every {i} days", "2024-01-01 09:00:00")
+    path = tmp_path / "habits.snap"
+    export_snapshot(test_db, path)
+    with HabitSnapshot(path) as snapshot:
+        assert snapshot.get_habits_by_periodicity("every 299 days") == ["Habit 299"]
+
+    #too many periodicities fail without leaving the temporary file behind
+    test_db.executemany("INSERT INTO habits (name, periodicity) VALUES (?, ?)",
+                        [(f"Other {i}", f"Period {i}") for i in range(MAX_PERIODICITIES)])
+    with pytest.raises(ValueError):
+        export_snapshot(test_db, tmp_path / "other.snap")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["habits.snap"]
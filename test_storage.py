@@ -0,0 +1,141 @@
+"""
+This module groups all the unit tests for the storage module.
+The in-memory backend is filled with the same data as the test_db fixture and has to give the same answers.
+"""
+
+import sqlite3
+import time
+from datetime import timedelta
+from datetime import datetime
+from analytics import get_all_habits, get_habits_by_periodicity, calculate_longest_streak, calculate_longest_streak_all, \
+    get_habit_trends, get_most_struggling_habits, get_habits_page
+from db import get_db, add_habit, delete_habit
+from habit import Habit
+from storage import MemoryStorage, SQLiteStorage
+import storage as storage_module
+import pytest
+
+
+def fill(storage):
+    storage.add_habit("Morning Jog", "Go for a 30-minute run every morning", "Daily", "2024-01-01 09:00:00", "2024-01-01 09:00:00")
+    storage.add_habit("Read a Book", "Read 10 pages of a book daily", "Daily", "2024-01-01 09:00:00", "2024-01-02 07:00:00")
+    storage.add_habit("Water the Plants", "Water indoor plants weekly", "Weekly", "2024-01-01 09:00:00")
+    storage.add_habit("Review Finances", "Check bank accounts weekly", "Weekly", "2024-01-01 09:00:00", "2024-01-15 10:00:00")
+    storage.add_habit("Call Parents", "Have a weekly call with parents", "Weekly", "2024-01-01 09:00:00", "2024-01-04 21:00:00")
+
+    storage.increment_habit("Morning Jog", "2024-01-01 09:00:00", 1)
+    storage.increment_habit("Read a Book", "2024-01-01 07:00:00", 1)
+    storage.increment_habit("Read a Book", "2024-01-02 07:00:00", 2)
+    storage.increment_habit("Review Finances", "2024-01-01 10:00:00", 1)
+    storage.increment_habit("Review Finances", "2024-01-08 10:00:00", 2)
+    storage.increment_habit("Review Finances", "2024-01-15 10:00:00", 3)
+    storage.increment_habit("Call Parents", "2024-01-04 21:00:00", 1)
+
+
+@pytest.fixture
+def memory_storage():
+    storage = MemoryStorage()
+    fill(storage)
+    yield storage
+
+
+def test_memory_storage_matches_sqlite(test_db, memory_storage):
+    assert get_all_habits(memory_storage) == get_all_habits(test_db)
+    for periodicity in ("daily", "Weekly"):
+        assert get_habits_by_periodicity(memory_storage, periodicity) == get_habits_by_periodicity(test_db, periodicity)
+    for habit in get_all_habits(test_db):
+        assert calculate_longest_streak(memory_storage, habit["name"]) == calculate_longest_streak(test_db, habit["name"])
+    assert calculate_longest_streak_all(memory_storage) == calculate_longest_streak_all(test_db)
+
+    assert get_habits_page(memory_storage, after="Morning Jog", limit=2) == get_habits_page(test_db, after="Morning Jog", limit=2)
+    for after in (None, "Call Parents"):
+        assert get_habits_page(memory_storage, after, 5, "weekly") == get_habits_page(test_db, after, 5, "weekly")
+
+    now = datetime(2024, 1, 16)
+    assert get_habit_trends(memory_storage, "Review Finances", now) == get_habit_trends(test_db, "Review Finances", now)
+    assert get_most_struggling_habits(memory_storage, now=now) == get_most_struggling_habits(test_db, now=now)
+
+
+def test_habit_with_memory_storage(memory_storage):
+    habit = Habit.load(memory_storage, "Review Finances")
+    habit.increment_streak(memory_storage, increment_date=habit.last_increment_date + timedelta(weeks=1))
+    assert habit.current_streak == 4
+    assert calculate_longest_streak(memory_storage, "Review Finances") == 4
+
+    Habit.delete(memory_storage, "Review Finances")
+    with pytest.raises(ValueError):
+        Habit.load(memory_storage, "Review Finances")
+    assert get_habits_by_periodicity(memory_storage, "weekly") == ["Water the Plants", "Call Parents"]
+
+
+def test_memory_storage_rejects_duplicates(memory_storage):
+    with pytest.raises(ValueError):
+        memory_storage.add_habit("Morning Jog", "", "Daily", "2024-01-01 09:00:00")
+
+
+def test_write_behind(tmp_path):
+    path = str(tmp_path / "habits.db")
+    storage = MemoryStorage(persist_to=path, interval=60)
+    fill(storage)
+    storage.delete_habit("Call Parents")
+    storage.close()
+
+    db = get_db(path)
+    assert calculate_longest_streak(db, "Review Finances") == 3
+    assert len(get_all_habits(db)) == 4
+    db.close()
+
+    #a new storage object starts with the persisted state
+    storage = MemoryStorage(persist_to=path, interval=60)
+    db = get_db(path)
+    assert get_all_habits(storage) == get_all_habits(SQLiteStorage(db))
+    assert calculate_longest_streak(storage, "Read a Book") == 2
+    storage.close()
+    db.close()
+
+
+def test_write_behind_drops_conflicting_change(tmp_path, caplog):
+    path = str(tmp_path / "habits.db")
+    storage = MemoryStorage(persist_to=path, interval=60)
+    storage.add_habit("Yoga", "", "Daily", "2024-01-01 09:00:00")
+    storage.add_habit("Swim", "", "Daily", "2024-01-01 09:00:00")
+    storage.increment_habit("Yoga", "2024-01-01 09:00:00", 1)
+    storage.increment_habit("Swim", "2024-01-01 09:00:00", 1)
+
+    #another process adds a habit with the same name, only the conflicting add cannot be written
+    db = get_db(path)
+    add_habit(db, "Yoga", "", "Weekly", "2024-01-01 09:00:00")
+    storage.flush()
+    assert "Dropping change add_habit" in caplog.text
+    assert storage._pending == []
+    assert [habit["name"] for habit in get_all_habits(db)] == ["Yoga", "Swim"]
+    assert calculate_longest_streak(db, "Swim") == 1
+    storage.close()
+    db.close()
+
+
+def test_write_behind_requeues_on_transient_error(tmp_path, monkeypatch, caplog):
+    path = str(tmp_path / "habits.db")
+    storage = MemoryStorage(persist_to=path, interval=0.01)
+    storage.add_habit("Yoga", "", "Daily", "2024-01-01 09:00:00")
+    storage.increment_habit("Yoga", "2024-01-01 09:00:00", 1)
+
+    #the database cannot be opened for a while, e.g. because it is locked
+    def locked_db(name):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(storage_module, "get_db", locked_db)
+    for _ in range(100):
+        if "failed" in caplog.text:
+            break
+        time.sleep(0.01)
+    assert "failed" in caplog.text
+    assert storage._thread.is_alive()
+    assert len(storage._pending) == 2
+
+    monkeypatch.undo()
+    storage.close()
+    db = get_db(path)
+    assert [habit["name"] for habit in get_all_habits(db)] == ["Yoga"]
+    assert calculate_longest_streak(db, "Yoga") == 1
+    db.close()
@@ -0,0 +1,81 @@
+"""
+This module groups all the unit tests for the trends module.
+"""
+
+from datetime import datetime
+from trends import update_trend, trend_stats, to_row, from_row, RECENT_PERIODS
+import pytest
+
+
+def test_update_trend():
+    trend = None
+    for period in (0, 1, 2, 5):
+        trend = update_trend(trend, period)
+    assert trend["first_period"] == 0
+    assert trend["last_period"] == 5
+    assert trend["recent"] == 0b111001 #bit 0 is the latest period
+    assert trend["breaks"] == 1
+    assert trend["consistency"] == pytest.approx(0.271 * 0.9 ** 3 + 0.1)
+
+    #incrementing twice in the same period changes nothing
+    assert update_trend(trend, 5) == trend
+    assert update_trend(trend, 1) == trend
+
+
+def test_late_completion():
+    trend = None
+    for period in (0, 1, 2, 5):
+        trend = update_trend(trend, period)
+
+    #period 4 shrinks the gap 3-4, period 3 closes it
+    late = update_trend(trend, 4)
+    assert late["recent"] == 0b111011
+    assert late["breaks"] == 1
+    late = update_trend(late, 3)
+    assert late["breaks"] == 0
+
+    in_order = None
+    for period in (0, 1, 2, 3, 4, 5):
+        in_order = update_trend(in_order, period)
+    assert late["recent"] == in_order["recent"]
+    assert late["consistency"] == pytest.approx(in_order["consistency"])
+
+    #a completion in the middle of a gap splits it, one before the first completion starts a new one
+    assert update_trend(update_trend(update_trend(None, 0), 4), 2)["breaks"] == 2
+    assert update_trend(update_trend(None, 5), 2)["breaks"] == 1
+    assert update_trend(update_trend(None, 5), 4)["breaks"] == 0
+
+
+def test_late_completion_outside_recent_periods():
+    trend = update_trend(update_trend(None, 0), RECENT_PERIODS + 10)
+    #the neighbours of period 5 are unknown, the completion is ignored
+    assert update_trend(trend, 5) == trend
+
+
+def test_recent_periods_are_bounded():
+    trend = update_trend(update_trend(None, 0), 1000)
+    assert trend["recent"] == 1
+    assert trend["recent"].bit_length() <= RECENT_PERIODS
+
+
+def test_row_conversion():
+    trend = update_trend(update_trend(None, 3), 4)
+    assert from_row(*to_row(trend)) == trend
+    assert from_row(*to_row(None)) is None
+
+
+def test_trend_stats_weekly_windows():
+    trend = None
+    for period in (0, 1, 2):
+        trend = update_trend(trend, period)
+    #a 30-day window spans 5 weeks, but the habit only exists for 3
+    stats = trend_stats(trend, "Weekly", "2024-01-01 09:00:00", now=datetime(2024, 1, 16))
+    assert stats["completion_rate_7d"] == 1.0
+    assert stats["completion_rate_30d"] == 1.0
+    assert stats["breaks"] == 0
+
+
+def test_trend_stats_never_incremented():
+    stats = trend_stats(None, "Daily", "2024-01-01 09:00:00", now=datetime(2024, 1, 16))
+    assert stats["consistency"] == 0.0
+    assert stats["completion_rate_90d"] == 0.0
@@ -0,0 +1,125 @@
+"""
+The trends module maintains rolling statistics per habit that are updated in O(1) on every increment.
+
+The state of a habit consists of
+- first_period / last_period: the first and the latest completed period (see history.period_index()),
+- recent: a bitmask of the last RECENT_PERIODS periods ending at last_period (bit 0 is last_period),
+- consistency: an exponentially weighted moving average over all periods, 1 for completed and 0 for missed periods,
+- breaks: how often a streak was broken, i.e. how often at least one period was missed after a completion.
+
+Missed periods after the latest completion are applied when the statistics are read, so the state does not have to be
+touched while a habit is not incremented.
+"""
+
+from datetime import datetime
+from history import period_index, PERIOD_DAYS
+
+WINDOW_DAYS = (7, 30, 90)
+RECENT_PERIODS = 90
+RECENT_BYTES = (RECENT_PERIODS + 7) // 8
+RECENT_MASK = (1 << RECENT_PERIODS) - 1
+ALPHA = 0.1 #weight of the latest period in the consistency score
+
+
+def update_trend(trend, period):
+    """
+    Applies a completed period to the trend state of a habit.
+
+    A completion that is recorded late, i.e. for a period before the latest completed one, is applied as if it had
+    been recorded in order: it adds its weight to the consistency score and closes, shrinks or splits the gap it
+    falls into. This needs the neighbouring periods, so late completions are ignored if they lie after the first
+    completion but their earlier neighbour is older than the recent bitmask.
+
+    :param trend: The current state as dictionary or None if the habit was never incremented.
+    :param period: The index of the completed period.
+    :return: The new state as dictionary.
+    """
+    if trend is None:
+        return {"first_period": period, "last_period": period, "recent": 1, "consistency": ALPHA, "breaks": 0}
+
+    trend = dict(trend)
+    gap = period - trend["last_period"]
+    if gap > 0:
+        #gap - 1 missed periods followed by one completed period
+        trend["consistency"] = trend["consistency"] * (1 - ALPHA) ** gap + ALPHA
+        trend["recent"] = ((trend["recent"] << gap) | 1) & RECENT_MASK
+        trend["last_period"] = period
+        if gap > 1:
+            trend["breaks"] += 1
+    elif gap < 0:
+        age = -gap
+        if period < trend["first_period"]: #a new first completion, it starts a gap unless it is right before the old one
+            trend["breaks"] += 0 if period + 1 == trend["first_period"] else 1
+            trend["first_period"] = period
+        elif age < RECENT_PERIODS and (age + 1 < RECENT_PERIODS or period - 1 == trend["first_period"]):
+            if trend["recent"] >> age & 1:
+                return trend #the period was completed already
+            later = bool(trend["recent"] >> (age - 1) & 1)
+            earlier = period - 1 == trend["first_period"] or bool(trend["recent"] >> (age + 1) & 1)
+            #the period was missed between two completions: filling it closes, shrinks or splits that gap
+            trend["breaks"] += {(True, True): -1, (False, False): 1}.get((later, earlier), 0)
+        else:
+            return trend
+        if age < RECENT_PERIODS:
+            trend["recent"] |= 1 << age
+        trend["consistency"] += ALPHA * (1 - ALPHA) ** age
+    return trend
+
+
+def to_row(trend):
+    """
+    Converts a trend state into the values of the trend columns of the habits table.
+    """
+    if trend is None:
+        return None, None, None, None, None
+    return (trend["first_period"], trend["last_period"], trend["recent"].to_bytes(RECENT_BYTES, "little"),
+            trend["consistency"], trend["breaks"])
+
+
+def from_row(first_period, last_period, recent, consistency, breaks):
+    """
+    Converts the values of the trend columns of the habits table into a trend state.
+    """
+    if last_period is None:
+        return None
+    return {"first_period": first_period, "last_period": last_period, "recent": int.from_bytes(recent, "little"),
+            "consistency": consistency, "breaks": breaks}
+
+
+def trend_stats(trend, periodicity, created_at, now=None):
+    """
+    Calculates the rolling statistics of a habit at a given time.
+
+    :param trend: The trend state or None if the habit was never incremented.
+    :param periodicity: The periodicity of the habit, either "Daily" or "Weekly".
+    :param created_at: The datetime or timestamp string of the creation of the habit.
+    :param now: The reference datetime, defaults to the current time.
+    :return: A dictionary with the following keys:
+             - "completion_rate_7d", "completion_rate_30d", "completion_rate_90d": The share of completed periods
+               within the last 7, 30 and 90 days, counting only periods since the creation of the habit.
+             - "consistency": The exponentially weighted completion score between 0 and 1.
+             - "breaks": How often the streak was broken, including a currently broken streak.
+             - "break_frequency": Breaks per period since the first completion.
+    """
+    current = period_index(periodicity, created_at, now or datetime.now())
+    period_days = PERIOD_DAYS.get((periodicity or "").lower(), 1)
+    stats = {}
+    if trend is None:
+        for days in WINDOW_DAYS:
+            stats[f"completion_rate_{days}d"] = 0.0
+        stats.update({"consistency": 0.0, "breaks": 0, "break_frequency": 0.0})
+        return stats
+
+    elapsed = max(current - trend["last_period"], 0)
+    recent = (trend["recent"] << elapsed) & RECENT_MASK #bit 0 is the current period now
+    for days in WINDOW_DAYS:
+        periods = min(-(-days // period_days), current + 1) #the window never reaches back before the creation
+        stats[f"completion_rate_{days}d"] = bin(recent & ((1 << periods) - 1)).count("1") / periods if periods > 0 else 0.0
+
+    #the current period can still be completed, so only the periods in between are missed
+    missed = max(elapsed - 1, 0)
+    breaks = trend["breaks"] + (1 if missed else 0)
+    stats["consistency"] = trend["consistency"] * (1 - ALPHA) ** missed
+    stats["breaks"] = breaks
+    stats["break_frequency"] = breaks / (max(current, trend["last_period"]) - trend["first_period"] + 1)
+    return stats